@@ -18,6 +18,16 @@ OUTPUT_DIR = os.path.join(PROJECT_ROOT, "output")
 SCRIPTS_DIR = os.path.join(PROJECT_ROOT, "scripts")
 NOTEBOOKS_DIR = os.path.join(PROJECT_ROOT, "notebooks")
 
+# Exploratory runs on a stratified sample (see scripts/sampling.py), turned
+# on by ``aqi --sample FRACTION`` or the AQI_SAMPLE environment variable.
+# Sampled results go to their own output folders.
+SAMPLE_FRACTION = float(os.environ.get("AQI_SAMPLE") or 0)
+SAMPLE_SEED = int(os.environ.get("AQI_SAMPLE_SEED") or 0)
+SAMPLE_CONFIDENCE = 0.95  # level of the confidence intervals of sampled estimates
+if 0 < SAMPLE_FRACTION < 1:
+    VISUALS_DIR = os.path.join(VISUALS_DIR, "sample")
+    OUTPUT_DIR = os.path.join(OUTPUT_DIR, "sample")
+
 # File paths
 CITY_DAY_RAW = os.path.join(RAW_DATA_DIR, "city_day.csv")
 CITY_HOUR_RAW = os.path.join(RAW_DATA_DIR, "city_hour.csv")
@@ -31,9 +41,23 @@ STATION_DAY_CLEANED = os.path.join(PROCESSED_DATA_DIR, "station_day_cleaned.csv"
 STATION_HOUR_CLEANED = os.path.join(PROCESSED_DATA_DIR, "station_hour_cleaned.csv")
 STATIONS_CLEANED = os.path.join(PROCESSED_DATA_DIR, "stations_cleaned.csv")
 
+# Processed datasets split by year and City (see scripts/partitions.py)
+PARTITIONED_DATA_DIR = os.path.join(PROCESSED_DATA_DIR, "partitioned")
+
+# Cached stratified samples of the processed datasets
+SAMPLE_DATA_DIR = os.path.join(PROCESSED_DATA_DIR, "samples")
+
+# Indexed SQLite copy of the processed datasets (see scripts/sqlite_store.py)
+SQLITE_DB = os.path.join(PROCESSED_DATA_DIR, "air_quality.db")
+
 # Analysis parameters
 POLLUTANTS = ['PM2.5', 'PM10', 'NO', 'NO2', 'NOx', 'NH3', 'CO', 'SO2', 'O3', 'Benzene', 'Toluene', 'Xylene']
-DATE_COLUMNS = ["Date", "date", "timestamp", "Datetime", "DateTime", "DATE", "RecordedDate", "dt"]
+
+# Every dataset stores its timestamp in one column with a fixed format
+# (see scripts/schema.py for the per-dataset registry)
+DATE_COLUMN = "Datetime"
+DATE_FORMAT_DAILY = "%Y-%m-%d"
+DATE_FORMAT_HOURLY = "%Y-%m-%d %H:%M:%S"
 
 # Visualization parameters
 FIGURE_SIZE_TREND = (12, 6)
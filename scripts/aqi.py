@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+aqi — single entry point for the air quality analysis scripts.
+
+Every subcommand maps to a function in one of the modules in ``scripts/``.
+The module is only imported once its subcommand is chosen, so heavy libraries
+(pandas, matplotlib, seaborn, plotly, scikit-learn) are loaded on demand and
+``aqi --help`` stays fast. All paths are resolved through ``config.py``, so the
+tool works from any directory:
+
+    python scripts/aqi.py --help
+    python scripts/aqi.py rank
+    ln -s "$PWD/scripts/aqi.py" ~/.local/bin/aqi && aqi summary
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.realpath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+for _path in (PROJECT_ROOT, SCRIPTS_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+# name -> (module, function, help). Kept here rather than in the modules so
+# building the parser never imports them.
+COMMANDS = {
+    "clean": ("clean_data", "main", "Clean raw CSVs into data/processed"),
+    "analyze": ("air_quality_analysis", "main", "Main static charts (trends, correlation, seasons)"),
+    "rank": ("city_ranking", "main", "Top polluted cities by average AQI"),
+    "seasonal": ("seasonal_analysis", "main", "Seasonal means per pollutant"),
+    "trends": ("pollution_trends", "main", "Yearly averages per city"),
+    "hotspots": ("pollution_hotspots", "main", "Cluster cities by pollutant profile"),
+    "stations": ("station_analysis", "main", "Monitoring stations per city"),
+    "missing": ("missing_values_report", "main", "Missing values summary and heatmap"),
+    "interactive": ("interactive_visualizations", "main", "Interactive plotly charts"),
+    "compare": ("city_comparison", "main", "Interactive city comparison chart"),
+    "dashboard": ("dashboard_bundle", "main", "Offline dashboard bundle in visuals/dashboard"),
+    "example": ("run_example", "main", "Quick demo: summary and PM2.5 plot"),
+    "summary": ("generate_summary", "main", "Markdown summary report from output/"),
+    "reports": ("city_reports", "main", "One Markdown report per city or station"),
+    "trend-stats": ("trend_stats", "main", "Seasonal Mann-Kendall and Sen's slope per series"),
+    "decompose": ("decomposition", "main", "Trend/seasonal/residual components for every series (cached)"),
+    "xcorr": ("cross_correlation", "main", "Lagged cross-correlation between pollutants and stations"),
+    "rankings": ("ranking_engine", "main", "Top-k per day/month/year with rank changes"),
+    "episodes": ("episodes", "main", "Consecutive runs at or above each AQI category"),
+    "partition": ("partitions", "main", "Split processed datasets into year/City partitions with a catalog"),
+    "impute": ("impute", "main", "Fill gaps per City/Station by interpolation or neighbouring stations"),
+    "reconcile": ("reconcile", "main", "Check city values against their stations and audit dropped rows"),
+    "derive-city-hour": ("derive_city_hour", "main", "Build city_hour from station_hour by streaming aggregation"),
+    "store": ("sqlite_store", "main", "Import the processed datasets into the indexed SQLite store"),
+    "watch": ("watch", "main", "Watch data/raw, ingest new files and refresh affected outputs"),
+    "all": ("run_all", "main", "Run the full pipeline in order"),
+}
+
+# Subcommand options, as (flags, add_argument kwargs). Option names match the
+# keyword arguments of the function the subcommand calls.
+OPTIONS = {
+    "reports": [
+        (("--dataset",), dict(default="city_day", choices=["city_day", "station_day", "city_hour", "station_hour"],
+                              help="Dataset to report on (default: city_day)")),
+        (("--workers",), dict(type=int, default=None, help="Worker processes (default: all cores)")),
+        (("--groups",), dict(nargs="+", default=None, metavar="NAME", help="Only these cities/stations")),
+    ],
+    "trend-stats": [
+        (("--datasets",), dict(nargs="+", default=["city_day", "station_day"],
+                               choices=["city_day", "station_day", "city_hour", "station_hour"],
+                               help="Datasets whose series are tested (default: city_day station_day)")),
+        (("--pollutants",), dict(nargs="+", default=None, metavar="NAME", help="Only these columns (default: all)")),
+        (("--alpha",), dict(type=float, default=0.05, help="Significance level for the direction (default: 0.05)")),
+        (("--workers",), dict(type=int, default=None, help="Worker processes (default: all cores)")),
+    ],
+    "decompose": [
+        (("--dataset",), dict(default="city_day", choices=["city_day", "station_day", "city_hour", "station_hour"],
+                              help="Dataset to decompose (default: city_day)")),
+        (("--pollutants",), dict(nargs="+", default=None, metavar="NAME", help="Only these columns (default: all)")),
+        (("--period",), dict(type=int, default=None, help="Season length in periods (default: 365 days or 24 hours)")),
+        (("--seasonal-window",), dict(type=int, default=3, metavar="CYCLES",
+                                      help="Cycles averaged for each seasonal value (default: 3)")),
+        (("--trend-window",), dict(type=int, default=None, metavar="N",
+                                   help="Trend moving-average window (default: one period)")),
+        (("--passes",), dict(type=int, default=2, help="Trend/seasonal refinement passes (default: 2)")),
+    ],
+    "xcorr": [
+        (("--dataset",), dict(default="station_hour", choices=["city_day", "station_day", "city_hour", "station_hour"],
+                              help="Dataset to correlate (default: station_hour)")),
+        (("--pollutants",), dict(nargs="+", default=None, metavar="NAME", help="Only these columns (default: all)")),
+        (("--max-lag",), dict(type=int, default=None, metavar="N",
+                              help="Largest lag in periods (default: 72 hours or 30 days)")),
+        (("--min-overlap",), dict(type=int, default=10, metavar="N",
+                                  help="Ignore lags with fewer common readings (default: 10)")),
+    ],
+    "rankings": [
+        (("--dataset",), dict(default="city_day", choices=["city_day", "station_day", "city_hour", "station_hour"],
+                              help="Dataset to rank (default: city_day)")),
+        (("--metric",), dict(default="AQI", help="Column to rank by (default: AQI)")),
+        (("--k",), dict(type=int, default=10, help="Size of each top list (default: 10)")),
+        (("--periods",), dict(nargs="*", default=["day", "month", "year"], choices=["day", "month", "year"],
+                              help="Calendar windows to rank (default: day month year)")),
+        (("--rolling",), dict(type=int, default=None, metavar="DAYS", help="Also rank trailing N-day windows")),
+        (("--extend",), dict(default=None, metavar="CSV", help="Append new days from CSV to the saved state")),
+    ],
+    "episodes": [
+        (("--dataset",), dict(default="city_day", choices=["city_day", "station_day", "city_hour", "station_hour"],
+                              help="Dataset to scan (default: city_day)")),
+        (("--metric",), dict(default="AQI", help="Column compared with the AQI thresholds (default: AQI)")),
+        (("--categories",), dict(nargs="+", default=None, metavar="NAME",
+                                 help="AQI categories to detect (default: all above Good)")),
+        (("--min-duration",), dict(type=int, default=1, metavar="N", help="Drop episodes shorter than N periods")),
+    ],
+    "partition": [
+        (("--datasets",), dict(nargs="+", default=None,
+                               choices=["city_day", "station_day", "city_hour", "station_hour"],
+                               help="Datasets to partition (default: every processed dataset present)")),
+    ],
+    "impute": [
+        (("--dataset",), dict(default="station_day", choices=["city_day", "station_day", "city_hour", "station_hour"],
+                              help="Dataset to impute (default: station_day)")),
+        (("--methods",), dict(nargs="+", default=None, choices=["interpolate", "neighbour"],
+                              help="Methods to apply in order (default: config.IMPUTATION_METHODS)")),
+        (("--max-gap",), dict(type=int, default=None, metavar="N",
+                              help="Leave gaps longer than N periods unfilled by interpolation")),
+        (("--no-complete",), dict(dest="complete", action="store_false",
+                                  help="Do not insert rows for periods missing from a series")),
+    ],
+    "watch": [
+        (("--interval",), dict(type=float, default=5.0, metavar="SECONDS", help="Polling interval (default: 5)")),
+        (("--debounce",), dict(type=float, default=10.0, metavar="SECONDS",
+                               help="Wait until no file has changed for this long (default: 10)")),
+        (("--max-delay",), dict(type=float, default=60.0, metavar="SECONDS",
+                                help="Ingest a continuous burst after this long at the latest (default: 60)")),
+        (("--concurrency",), dict(type=int, default=4, help="Files parsed at the same time (default: 4)")),
+        (("--workers",), dict(type=int, default=None, help="Worker processes (default: min(concurrency, cores))")),
+        (("--no-rerun",), dict(dest="rerun", action="store_false", help="Only ingest; do not clean or refresh outputs")),
+        (("--once",), dict(action="store_true", help="Ingest whatever is new and exit")),
+    ],
+    "reconcile": [
+        (("--resolution",), dict(default="day", choices=["day", "hour"],
+                                 help="Compare city_day/station_day or city_hour/station_hour (default: day)")),
+        (("--abs-tol",), dict(type=float, default=0.5, help="Absolute tolerance (default: 0.5)")),
+        (("--rel-tol",), dict(type=float, default=0.01, help="Tolerance as a fraction of the city value (default: 0.01)")),
+        (("--max-details",), dict(type=int, default=10000, metavar="N",
+                                  help="Write at most N of the largest discrepancies (default: 10000)")),
+    ],
+    "store": [
+        (("--datasets",), dict(nargs="+", default=None,
+                               choices=["city_day", "station_day", "city_hour", "station_hour", "stations"],
+                               help="Datasets to import (default: all)")),
+        (("--rebuild",), dict(action="store_true", help="Re-import even if the CSV is unchanged")),
+        (("--no-benchmark",), dict(dest="benchmark", action="store_false",
+                                   help="Skip timing sample lookups after the import")),
+    ],
+    "derive-city-hour": [
+        (("--sources",), dict(nargs="+", default=["raw", "processed"], choices=["raw", "processed"],
+                              help="Derive the raw and/or processed city_hour file (default: both)")),
+        (("--chunksize",), dict(type=int, default=1_000_000, metavar="ROWS",
+                                help="station_hour rows read per chunk (default: 1000000)")),
+    ],
+}
+
+
+def _fraction(value):
+    fraction = float(value)
+    if not 0 < fraction <= 1:
+        raise argparse.ArgumentTypeError(f"sample fraction must be in (0, 1], got {value}")
+    return fraction
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="aqi",
+        description="Air quality analysis for Indian cities (2015-2024).",
+    )
+    parser.add_argument("--sample", type=_fraction, default=None, metavar="FRACTION",
+                        help="Exploratory run on a stratified City x year x month sample of the processed "
+                             "data, e.g. 0.05; results go to output/sample/ and visuals/sample/")
+    parser.add_argument("--sample-seed", type=int, default=None, metavar="N",
+                        help="Seed of the sample (default: 0)")
+    subparsers = parser.add_subparsers(dest="command", metavar="<command>")
+    subparsers.required = True
+    for name, (module, func, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        for flags, kwargs in OPTIONS.get(name, []):
+            sub.add_argument(*flags, **kwargs)
+        sub.set_defaults(_module=module, _func=func)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = {k: v for k, v in vars(args).items()
+               if k not in ("command", "_module", "_func", "sample", "sample_seed")}
+    # Set before any script imports config; subprocesses (all, watch) inherit it
+    if args.sample is not None:
+        os.environ["AQI_SAMPLE"] = str(args.sample)
+    if args.sample_seed is not None:
+        os.environ["AQI_SAMPLE_SEED"] = str(args.sample_seed)
+    module = importlib.import_module(args._module)
+    result = getattr(module, args._func)(**options)
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,41 @@
 # scripts/city_comparison_dashboard.py
-import pandas as pd
-import plotly.express as px
 import os
+import sys
+from pathlib import Path
 
-PROCESSED = "../data/processed/"
-VISUALS = "../visuals/"
-os.makedirs(VISUALS, exist_ok=True)
+import plotly.express as px
 
-def detect_date_col(df):
-    for c in ["Date","date","Datetime","datetime","timestamp","Timestamp","DateTime"]:
-        if c in df.columns:
-            return c
-    return None
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from sampling import group_estimates, label
+from schema import get_schema, load_dataset
 
 def main():
-    file = PROCESSED + "city_day_cleaned.csv"
+    file = config.CITY_DAY_CLEANED
     print("Loading:", file)
-    df = pd.read_csv(file)
-    date_col = detect_date_col(df)
-    if not date_col:
-        print("No date column. Exiting.")
-        return
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col])
+    date_col = config.DATE_COLUMN
+    columns = get_schema("city_day").columns
 
-    metric = "PM2.5" if "PM2.5" in df.columns else ("AQI" if "AQI" in df.columns else None)
+    metric = "PM2.5" if "PM2.5" in columns else ("AQI" if "AQI" in columns else None)
     if not metric:
         print("No PM2.5 or AQI. Exiting.")
         return
 
-    # choose top 6 cities
-    top = df.groupby("City")[metric].mean().nlargest(6).index.tolist()
-    dash_df = df[df["City"].isin(top)].copy()
+    # choose top 6 cities, then load only their rows (their partitions, if partitioned)
+    # (stratified estimates of the city means in sample mode)
+    means = group_estimates(load_dataset("city_day", columns=["City", date_col, metric]), ["City"], [metric])
+    top = means.nlargest(6, "mean")["City"].tolist()
+    dash_df = load_dataset("city_day", columns=["City", date_col, metric], cities=top)
 
     # simple interactive figure
     fig = px.line(dash_df, x=date_col, y=metric, color="City",
-                  title=f"{metric} over time — Top 6 cities",
+                  title=f"{metric} over time — Top 6 cities{label(dash_df)}",
                   labels={date_col:"Date", metric:metric},
                   color_discrete_sequence=px.colors.qualitative.Set1)
-    out_html = VISUALS + "city_comparison_dashboard.html"
-    fig.write_html(out_html)
+    os.makedirs(config.VISUALS_DIR, exist_ok=True)
+    out_html = os.path.join(config.VISUALS_DIR, "city_comparison_dashboard.html")
+    # Shares visuals/plotly.min.js with the other pages instead of embedding it
+    fig.write_html(out_html, include_plotlyjs='directory')
     print("Saved interactive dashboard:", out_html)
 
 if __name__ == "__main__":
@@ -1,21 +1,28 @@
+import os
+import sys
+from pathlib import Path
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-PROCESSED_PATH = "../data/processed/"
-OUTPUT_PATH = "../output/"
-VISUALS_PATH = "../visuals/"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from sampling import group_estimates, label, rank_with_ci
+from schema import load_dataset
 
-# Ensure folders exist
-os.makedirs(OUTPUT_PATH, exist_ok=True)
-os.makedirs(VISUALS_PATH, exist_ok=True)
+OUTPUT_PATH = config.OUTPUT_DIR
+VISUALS_PATH = config.VISUALS_DIR
 
 def top_polluted_cities_report():
-    file_path = PROCESSED_PATH + "city_day_cleaned.csv"
+    # Ensure folders exist
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+    os.makedirs(VISUALS_PATH, exist_ok=True)
+
+    file_path = config.CITY_DAY_CLEANED
     print(f"📌 Loading {file_path}")
 
-    df = pd.read_csv(file_path)
+    df = load_dataset("city_day")
 
     # Ensure AQI column exists
     if "AQI" not in df.columns:
@@ -29,29 +36,36 @@ def top_polluted_cities_report():
     df["AQI"] = pd.to_numeric(df["AQI"], errors="coerce")
     df = df.dropna(subset=["AQI"])
 
-    # Compute average AQI per city
-    top_cities = df.groupby("City")["AQI"].mean().sort_values(ascending=False)
+    # Average AQI per city (stratified estimate with its CI in sample mode)
+    tag = label(df)
+    ranking = rank_with_ci(group_estimates(df, ["City"], ["AQI"])).set_index("City")
 
     # Get top 10 most polluted
-    top10 = top_cities.head(10)
+    top10 = ranking.head(10)
 
-    # Save to CSV
-    csv_path = OUTPUT_PATH + "top_polluted_cities.csv"
-    top10.to_csv(csv_path)
-    print(f"✅ Saved CSV report: {csv_path}")
+    # Save to CSV; a sampled ranking also gets its intervals and rank range
+    csv_path = os.path.join(OUTPUT_PATH, "top_polluted_cities.csv")
+    if tag:
+        top10.rename(columns={"mean": "AQI"})[["AQI", "se", "ci_low", "ci_high", "rank", "rank_best",
+                                               "rank_worst"]].to_csv(csv_path)
+    else:
+        top10["mean"].rename("AQI").to_csv(csv_path)
+    print(f"✅ Saved CSV report{tag}: {csv_path}")
 
     # Plot and save chart
     plt.figure(figsize=(12, 6))
     colors = plt.cm.viridis(np.linspace(0, 1, len(top10)))  # Vibrant color palette
-    top10.plot(kind="bar", color=colors, edgecolor="black", linewidth=1.5)
-    plt.title("Top 10 Most Polluted Cities in India (Avg AQI 2015–2024)", fontsize=16, fontweight='bold')
+    errors = (top10["mean"] - top10["ci_low"]).values if tag else None
+    top10["mean"].plot(kind="bar", yerr=errors, capsize=6, color=colors, edgecolor="black", linewidth=1.5)
+    plt.title("Top 10 Most Polluted Cities in India (Avg AQI 2015–2024)" + (f"\n{tag.strip()}" if tag else ""),
+              fontsize=16, fontweight='bold')
     plt.xlabel("City", fontsize=14)
     plt.ylabel("Average AQI", fontsize=14)
     plt.xticks(rotation=45, ha='right')
     plt.grid(axis='y', linestyle='--', alpha=0.7)
     plt.tight_layout()
 
-    img_path = VISUALS_PATH + "top_polluted_cities.png"
+    img_path = os.path.join(VISUALS_PATH, "top_polluted_cities.png")
     plt.savefig(img_path)
     print(f"📊 Saved visual: {img_path}")
 
@@ -0,0 +1,212 @@
+"""
+Generate one Markdown report per City (or Station) with charts.
+
+Each report covers the yearly trend, the seasonal (month-of-year) profile,
+the group's position in the AQI ranking and missing values per pollutant.
+
+The processed dataset is loaded once, sorted by (group, Datetime) and copied
+into ``multiprocessing.shared_memory`` blocks. Pool workers attach to those
+blocks by name and read their group's contiguous slice as NumPy views, so the
+only thing pickled per task is a small tuple of labels and row bounds.
+
+    python scripts/aqi.py reports --dataset station_day --workers 8
+"""
+
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from dashboard_bundle import safe_name
+from generate_summary import to_markdown
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+REPORTS_DIR = os.path.join(config.OUTPUT_DIR, "reports")
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+CHART_POLLUTANTS = ["PM2.5", "PM10", "NO2", "O3"]
+
+# Views onto the shared blocks, set once per worker by _attach()
+_shared = {}
+
+
+def share_array(array):
+    """Copy an array into a new shared memory block; return (block, spec)."""
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _attach(specs, columns, out_dir):
+    blocks = {}
+    for key, (name, shape, dtype) in specs.items():
+        # Pool workers share the parent's resource tracker, and the parent
+        # unlinks the blocks once the pool has finished
+        block = shared_memory.SharedMemory(name=name)
+        blocks[key] = block
+        _shared[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    _shared["_blocks"] = blocks
+    _shared["columns"] = columns
+    _shared["out_dir"] = out_dir
+
+
+def _render(task):
+    """Worker: compute one group's tables and charts and write its page."""
+    label, file_stem, lo, hi, rank, n_groups, mean_aqi = task
+    times = _shared["times"][lo:hi]
+    values = _shared["values"][lo:hi]
+    columns = _shared["columns"]
+    out_dir = _shared["out_dir"]
+
+    years = times.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = times.astype("datetime64[M]").astype(np.int64) % 12
+    yearly = group_means(years - years.min(), values)
+    seasonal = group_means(months, values, size=12)
+    missing = np.isnan(values).mean(axis=0)
+
+    year_labels = np.arange(years.min(), years.min() + len(yearly))
+    trend_png = f"{file_stem}_trend.png"
+    seasonal_png = f"{file_stem}_seasonal.png"
+    plot_profile(year_labels, yearly, columns, f"Yearly average — {label}", "Year",
+                 os.path.join(out_dir, trend_png))
+    plot_profile(np.arange(12), seasonal, columns, f"Seasonal profile — {label}", "Month",
+                 os.path.join(out_dir, seasonal_png), ticks=MONTHS)
+
+    lines = []
+    lines.append(f"# Air Quality Report — {label}\n")
+    lines.append(f"Period: {times.min()} to {times.max()} ({hi - lo} records).\n")
+    lines.append("## Ranking\n")
+    if rank:
+        lines.append(f"- Rank {rank} of {n_groups} by average AQI ({mean_aqi:.1f})\n\n")
+    else:
+        lines.append("- Not ranked (no AQI values)\n\n")
+    lines.append("## Yearly Trend\n")
+    lines.append(f"![Yearly trend]({trend_png})\n\n")
+    lines.append(to_markdown(_table("Year", year_labels, yearly, columns)))
+    lines.append("\n\n## Seasonal Profile\n")
+    lines.append(f"![Seasonal profile]({seasonal_png})\n\n")
+    lines.append(to_markdown(_table("Month", MONTHS, seasonal, columns)))
+    lines.append("\n\n## Missing Values\n")
+    lines.append(to_markdown([{"Pollutant": c, "missing_fraction": f"{m:.4f}"}
+                              for c, m in zip(columns, missing)]))
+    lines.append("\n")
+
+    out_file = os.path.join(out_dir, f"{file_stem}.md")
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.writelines([line + '\n' if not line.endswith('\n') else line for line in lines])
+    return out_file
+
+
+def group_means(codes, values, size=None):
+    """NaN-aware mean of every column of ``values`` per integer code."""
+    size = size or int(codes.max()) + 1
+    valid = ~np.isnan(values)
+    sums = np.zeros((size, values.shape[1]))
+    counts = np.zeros((size, values.shape[1]))
+    for j in range(values.shape[1]):
+        sums[:, j] = np.bincount(codes, weights=np.where(valid[:, j], values[:, j], 0.0), minlength=size)
+        counts[:, j] = np.bincount(codes, weights=valid[:, j], minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def _table(name, labels, means, columns):
+    keep = [j for j, c in enumerate(columns) if c in CHART_POLLUTANTS + ["AQI"]]
+    return [{name: str(lab), **{columns[j]: f"{row[j]:.1f}" for j in keep}}
+            for lab, row in zip(labels, means)]
+
+
+def plot_profile(x, means, columns, title, xlabel, out_path, ticks=None):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 5))
+    for c in CHART_POLLUTANTS:
+        if c in columns:
+            plt.plot(x, means[:, columns.index(c)], marker="o", linewidth=2, label=c)
+    if ticks is not None:
+        plt.xticks(x, ticks)
+    plt.title(title, fontsize=14, fontweight='bold')
+    plt.xlabel(xlabel, fontsize=12)
+    plt.ylabel("Average concentration", fontsize=12)
+    plt.legend()
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    plt.savefig(out_path, dpi=120)
+    plt.close()
+
+
+def main(dataset="city_day", workers=None, groups=None):
+    schema = get_schema(dataset)
+    key = schema.keys[-1]
+    columns = list(schema.measures)
+    out_dir = REPORTS_DIR if dataset == "city_day" else os.path.join(REPORTS_DIR, dataset)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Reports cover every day of a series; never a sample
+    df = load_dataset(dataset, columns=[key, schema.date_column] + columns, sample=0)
+    if groups:
+        df = df[df[key].isin(groups)]
+    if df.empty:
+        logging.warning(f"No rows to report on in {dataset}.")
+        return
+    df = df.sort_values([key, schema.date_column], kind="stable")
+
+    labels, starts = np.unique(df[key].to_numpy(), return_index=True)
+    bounds = np.append(starts, len(df))
+    unit = "s" if schema.hourly else "D"
+    times = df[schema.date_column].to_numpy(f"datetime64[{unit}]")
+    values = np.ascontiguousarray(df[columns].to_numpy(np.float64))
+    del df
+
+    # Ranking position by mean AQI (1 = most polluted)
+    aqi = values[:, columns.index("AQI")]
+    mean_aqi = group_means(np.repeat(np.arange(len(labels)), np.diff(bounds)), aqi[:, None])[:, 0]
+    ranked = [i for i in np.argsort(-np.nan_to_num(mean_aqi, nan=-np.inf)) if not np.isnan(mean_aqi[i])]
+    rank_of = {i: r + 1 for r, i in enumerate(ranked)}
+
+    tasks = [(str(label), safe_name(label), int(bounds[i]), int(bounds[i + 1]),
+              rank_of.get(i), len(ranked), float(mean_aqi[i]))
+             for i, label in enumerate(labels)]
+
+    blocks = []
+    try:
+        specs = {}
+        for name, array in (("times", times), ("values", values)):
+            block, specs[name] = share_array(array)
+            blocks.append(block)
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        chunksize = max(1, len(tasks) // (workers * 4))
+        logging.info(f"Rendering {len(tasks)} {key} reports on {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(specs, columns, out_dir)) as pool:
+            written = list(pool.map(_render, tasks, chunksize=chunksize))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    write_index(out_dir, key, tasks)
+    logging.info(f"Saved {len(written)} reports to {out_dir}")
+
+
+def write_index(out_dir, key, tasks):
+    lines = [f"# {key} Reports\n", "Generated by `python scripts/aqi.py reports`.\n"]
+    for label, stem, _, _, rank, n_groups, mean_aqi in sorted(tasks, key=lambda t: t[4] or 1e9):
+        position = f"rank {rank}/{n_groups}, avg AQI {mean_aqi:.1f}" if rank else "not ranked"
+        lines.append(f"- [{label}]({stem}.md) — {position}\n")
+    with open(os.path.join(out_dir, "index.md"), 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+
+
+if __name__ == "__main__":
+    main()
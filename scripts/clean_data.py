@@ -1,7 +1,11 @@
-import pandas as pd
+import sys
 from pathlib import Path
 import logging
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -9,40 +13,62 @@ logger = logging.getLogger(__name__)
 # =====================================
 # 1. Project paths (IMPORTANT PART)
 # =====================================
-BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
-RAW_DIR = DATA_DIR / "raw"
-PROCESSED_DIR = DATA_DIR / "processed"
-
-INPUT_FILE = RAW_DIR / "city_day.csv"
-OUTPUT_FILE = PROCESSED_DIR / "city_day_cleaned.csv"
-
-try:
-    # Verify input file exists
-    if not INPUT_FILE.exists():
-        logger.error(f"Input file not found: {INPUT_FILE}")
-        logger.info(f"Files in {RAW_DIR}:")
-        if RAW_DIR.exists():
-            for f in RAW_DIR.glob("*.csv"):
-                logger.info(f"  - {f.name}")
-        raise FileNotFoundError(f"Input file not found: {INPUT_FILE}")
-    
-    # =====================================
-    # 2. Load data
-    # =====================================
-    df = pd.read_csv(INPUT_FILE)
-    logger.info(f"Loaded {len(df)} rows")
-
-    # ...existing code...
-
-    # =====================================
-    # 9. Save cleaned data
-    # =====================================
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-    df.to_csv(OUTPUT_FILE, index=False)
-    logger.info(f"✅ Cleaned data saved to: {OUTPUT_FILE}")
-
-except FileNotFoundError as e:
-    logger.error(f"❌ File error: {e}")
-except Exception as e:
-    logger.error(f"❌ Error: {e}", exc_info=True)
\ No newline at end of file
+RAW_DIR = Path(config.RAW_DATA_DIR)
+PROCESSED_DIR = Path(config.PROCESSED_DATA_DIR)
+
+INPUT_FILE = Path(config.CITY_DAY_RAW)
+OUTPUT_FILE = Path(config.CITY_DAY_CLEANED)
+
+
+def clean_rows(df, name):
+    """
+    Per-row rules of the processed files (the reasons reconcile reports for
+    dropped raw rows): drop rows of dataset ``name`` with a missing key,
+    repeated keys (the last one is kept) and zero or negative AQI.
+    """
+    schema = get_schema(name)
+    keys = [c for c in schema.columns if c in schema.keys or c == schema.date_column]
+    df = df.dropna(subset=keys).drop_duplicates(subset=keys, keep="last")
+    if "AQI" in df:
+        df = df[~(df["AQI"] <= 0)]
+    return df.reset_index(drop=True)
+
+
+def main():
+    try:
+        # Verify input file exists
+        if not INPUT_FILE.exists():
+            logger.error(f"Input file not found: {INPUT_FILE}")
+            logger.info(f"Files in {RAW_DIR}:")
+            if RAW_DIR.exists():
+                for f in RAW_DIR.glob("*.csv"):
+                    logger.info(f"  - {f.name}")
+            raise FileNotFoundError(f"Input file not found: {INPUT_FILE}")
+
+        # =====================================
+        # 2. Load data
+        # =====================================
+        # Validates the header and parses dates with the declared format
+        df = load_dataset("city_day", raw=True)
+        logger.info(f"Loaded {len(df)} rows")
+
+        # ...existing code...
+
+        # =====================================
+        # 9. Save cleaned data
+        # =====================================
+        PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_csv(OUTPUT_FILE, index=False)
+        logger.info(f"✅ Cleaned data saved to: {OUTPUT_FILE}")
+
+    except FileNotFoundError as e:
+        logger.error(f"❌ File error: {e}")
+        return 1
+    except Exception as e:
+        logger.error(f"❌ Error: {e}", exc_info=True)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
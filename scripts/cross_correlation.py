@@ -0,0 +1,245 @@
+"""
+Lagged cross-correlation between pollutants and between stations, via FFT.
+
+For every pair of series x, y the Pearson correlation of x[t] with y[t + k]
+is computed for all lags -L..L at once. A positive peak lag means x leads y.
+Series are placed on a regular time grid and gaps are masked rather than
+filled. Each lag uses only the timestamps where both series have a value,
+so its overlap count, means and variances are all per-lag sums of masked
+products. Each of these sums is a cross-correlation, computed with one
+FFT product. Pairs are processed in batches; the FFT of each series is
+taken once per batch and reused by every pair of the batch it appears in,
+so a full lag profile costs O(n log n) per pair instead of O(n * L).
+
+Pairs are formed per city:
+
+- pollutant pairs within each City/Station series (e.g. NO2 -> O3), and
+- station pairs within a city, for each pollutant (station datasets).
+
+Peak lags and strengths are written to ``output/cross_correlation/``, along
+with the full profiles (.npz). Interactive lag heatmaps are saved to visuals/.
+
+    python scripts/aqi.py xcorr --dataset station_hour --max-lag 72
+"""
+
+import logging
+import os
+import sys
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+XCORR_DIR = os.path.join(config.OUTPUT_DIR, "cross_correlation")
+PAIR_BATCH = 256  # pairs per FFT batch, bounds memory on long hourly series
+
+
+def masked_spectra(series, nfft):
+    """
+    rFFTs of mask, masked values and masked squares for each row of ``series``
+    (NaN = missing). Rows are centred first for numerical stability.
+    """
+    mask = ~np.isnan(series)
+    m = mask.astype(np.float64)
+    counts = m.sum(axis=1, keepdims=True)
+    means = np.where(mask, series, 0.0).sum(axis=1, keepdims=True) / np.maximum(counts, 1)
+    x = np.where(mask, series - means, 0.0)
+    return (np.fft.rfft(m, nfft), np.fft.rfft(x, nfft), np.fft.rfft(x * x, nfft))
+
+
+def masked_xcorr(spectra, pairs, max_lag, nfft, min_overlap=10):
+    """
+    Correlation profiles for ``pairs`` of rows, shape (pairs, 2 * max_lag + 1).
+
+    Entry [p, max_lag + k] correlates row a at t with row b at t + k.
+    Lags with fewer than ``min_overlap`` common readings are NaN.
+    """
+    fm, fx, fxx = spectra
+    a, b = np.asarray(pairs).T
+    lags = np.r_[np.arange(0, max_lag + 1), np.arange(-max_lag, 0)]  # irfft layout
+
+    def xc(fa, fb):
+        # sum_t u[t] v[t + k] for the selected lags
+        return np.fft.irfft(np.conj(fa[a]) * fb[b], nfft)[:, lags]
+
+    n = np.rint(xc(fm, fm))
+    sx, sy = xc(fx, fm), xc(fm, fx)
+    sxx, syy = xc(fxx, fm), xc(fm, fxx)
+    sxy = xc(fx, fx)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sxy - sx * sy
+        var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        r = np.where((n >= min_overlap) & (var > 0), cov / np.sqrt(np.maximum(var, 0)), np.nan)
+    r = np.clip(r, -1.0, 1.0)
+    # Reorder from irfft layout to -max_lag..max_lag
+    return np.concatenate([r[:, max_lag + 1:], r[:, :max_lag + 1]], axis=1)
+
+
+def profiles(series, pairs, max_lag, min_overlap=10):
+    """
+    Lag profiles for ``pairs`` of rows of ``series`` (rows x time), in batches.
+
+    Spectra are taken per batch, for the rows that batch uses only, so peak
+    memory is bounded by ``PAIR_BATCH`` rather than by the number of series.
+    """
+    length = series.shape[1]
+    nfft = 1 << int(np.ceil(np.log2(length + max_lag + 1)))  # no wrap-around within max_lag
+    out = []
+    for i in range(0, len(pairs), PAIR_BATCH):
+        rows, batch = np.unique(pairs[i:i + PAIR_BATCH], return_inverse=True)
+        spectra = masked_spectra(series[rows], nfft)
+        out.append(masked_xcorr(spectra, batch.reshape(-1, 2), max_lag, nfft, min_overlap))
+    return np.vstack(out) if out else np.empty((0, 2 * max_lag + 1))
+
+
+def peaks(r, max_lag):
+    """Lag and value of the largest |r| in each profile, plus the zero-lag r."""
+    filled = np.where(np.isnan(r), -1.0, np.abs(r))
+    best = filled.argmax(axis=1)
+    rows = np.arange(len(r))
+    peak_r = r[rows, best]
+    peak_lag = np.where(np.isnan(peak_r), np.nan, best - max_lag)
+    return peak_lag, peak_r, r[:, max_lag]
+
+
+def city_grid(df, key, measures, date_col, unit):
+    """Group labels and a (groups x measures x time) array on a regular time grid."""
+    import pandas as pd
+
+    steps = df[date_col].to_numpy(f"datetime64[{unit}]").astype(np.int64)
+    origin = steps.min()
+    length = int(steps.max() - origin) + 1
+    codes, labels = pd.factorize(df[key], sort=True)
+    grid = np.full((len(labels), len(measures), length), np.nan)
+    grid[codes[:, None], np.arange(len(measures))[None, :], (steps - origin)[:, None]] = \
+        df[measures].to_numpy(np.float64)
+    return list(labels), grid
+
+
+def analyse(dataset, measures=None, max_lag=None, min_overlap=10):
+    """Pollutant-pair and station-pair peak tables plus the raw profiles."""
+    import pandas as pd
+
+    schema = get_schema(dataset)
+    key = schema.keys[-1]
+    measures = list(measures or schema.measures)
+    unit = "h" if schema.hourly else "D"
+    max_lag = max_lag or (72 if schema.hourly else 30)
+    index = list(dict.fromkeys(["City", key, schema.date_column]))
+    # Lags need unbroken series, so sample mode does not apply
+    df = load_dataset(dataset, columns=index + measures, sample=0)
+    # One reading per series and timestamp
+    df = df.groupby(index)[measures].mean().reset_index()
+
+    pollutant_rows, station_rows, stored = [], [], []
+    for city, part in df.groupby("City", sort=True):
+        labels, grid = city_grid(part, key, measures, schema.date_column, unit)
+        n_groups, n_measures, length = grid.shape
+        series = grid.reshape(n_groups * n_measures, length)
+
+        pairs, meta = [], []
+        for g, label in enumerate(labels):
+            for i, j in combinations(range(n_measures), 2):
+                pairs.append((g * n_measures + i, g * n_measures + j))
+                meta.append(("pollutant", {"City": city, key: label, "x": measures[i], "y": measures[j]}))
+        if key != "City":
+            for g, h in combinations(range(n_groups), 2):
+                for i, measure in enumerate(measures):
+                    pairs.append((g * n_measures + i, h * n_measures + i))
+                    meta.append(("station", {"City": city, "pollutant": measure,
+                                             "x": labels[g], "y": labels[h]}))
+        if not pairs:
+            continue
+
+        r = profiles(series, np.array(pairs), max_lag, min_overlap)
+        lag, peak_r, zero_r = peaks(r, max_lag)
+        for p, (kind, labels_) in enumerate(meta):
+            row = {**labels_, "peak_lag": lag[p], "peak_r": peak_r[p], "zero_lag_r": zero_r[p]}
+            (pollutant_rows if kind == "pollutant" else station_rows).append(row)
+            stored.append((kind, labels_, r[p]))
+
+    lags = np.arange(-max_lag, max_lag + 1)
+    return pd.DataFrame(pollutant_rows), pd.DataFrame(station_rows), lags, stored
+
+
+def save_profiles(path, lags, stored):
+    kinds = np.array([k for k, _, _ in stored])
+    names = np.array(["|".join(f"{k}={v}" for k, v in labels.items()) for _, labels, _ in stored])
+    r = np.vstack([p for _, _, p in stored]) if stored else np.empty((0, len(lags)))
+    np.savez_compressed(path, lags=lags, kinds=kinds, pairs=names, r=r.astype(np.float32))
+
+
+def plot_lag_heatmap(stored, kind, lags, key, title, out_path, unit_name):
+    """One heatmap (pairs x lags) per group, switchable with a dropdown."""
+    import plotly.graph_objects as go
+
+    by_group = {}
+    for k, labels, r in stored:
+        if k != kind:
+            continue
+        group = labels[key] if kind == "pollutant" else labels["City"]
+        name = f"{labels['x']} → {labels['y']}" if kind == "pollutant" \
+            else f"{labels['pollutant']}: {labels['x']} → {labels['y']}"
+        by_group.setdefault(group, ([], []))
+        by_group[group][0].append(name)
+        by_group[group][1].append(r)
+    if not by_group:
+        return False
+
+    fig = go.Figure()
+    groups = sorted(by_group)
+    for i, group in enumerate(groups):
+        names, rows = by_group[group]
+        fig.add_trace(go.Heatmap(z=np.vstack(rows).astype(np.float32), x=lags, y=names, zmin=-1, zmax=1,
+                                 colorscale="RdBu_r", visible=i == 0, name=str(group),
+                                 colorbar=dict(title="r"),
+                                 hovertemplate=f"%{{y}}<br>lag %{{x}} {unit_name}<br>r = %{{z:.3f}}<extra></extra>"))
+    buttons = [dict(label=str(g), method="update",
+                    args=[{"visible": [j == i for j in range(len(groups))]}])
+               for i, g in enumerate(groups)]
+    fig.update_layout(title=title, xaxis_title=f"Lag ({unit_name}; positive = first series leads)",
+                      updatemenus=[dict(buttons=buttons, x=1.0, y=1.15, xanchor="right")],
+                      height=max(400, 18 * max(len(v[0]) for v in by_group.values()) + 150))
+    fig.write_html(out_path, include_plotlyjs='directory', full_html=True)
+    return True
+
+
+def main(dataset="station_hour", pollutants=None, max_lag=None, min_overlap=10):
+    schema = get_schema(dataset)
+    key = schema.keys[-1]
+    os.makedirs(XCORR_DIR, exist_ok=True)
+    os.makedirs(config.VISUALS_DIR, exist_ok=True)
+
+    pollutant_table, station_table, lags, stored = analyse(dataset, pollutants, max_lag, min_overlap)
+    unit_name = "hours" if schema.hourly else "days"
+
+    for name, table in (("pollutant", pollutant_table), ("station", station_table)):
+        if table.empty:
+            continue
+        out = os.path.join(XCORR_DIR, f"{dataset}_{name}_lags.csv")
+        table.to_csv(out, index=False)
+        logging.info(f"Saved {len(table)} {name} pairs: {out}")
+        html = os.path.join(config.VISUALS_DIR, f"{dataset}_{name}_lag_heatmap.html")
+        title = f"Lagged correlation between {name}s — {dataset}"
+        if plot_lag_heatmap(stored, name, lags, key, title, html, unit_name):
+            logging.info(f"Saved lag heatmap: {html}")
+    save_profiles(os.path.join(XCORR_DIR, f"{dataset}_profiles.npz"), lags, stored)
+
+    if not pollutant_table.empty:
+        strongest = pollutant_table.reindex(pollutant_table["peak_r"].abs().sort_values(ascending=False).index)
+        print(f"\nStrongest lagged pollutant pairs ({unit_name}; positive lag = x leads y):")
+        print(strongest.head(10).to_string(index=False))
+    if not station_table.empty:
+        strongest = station_table.reindex(station_table["peak_r"].abs().sort_values(ascending=False).index)
+        print("\nStrongest lagged station pairs:")
+        print(strongest.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Build the offline interactive dashboard in visuals/dashboard/.
+
+Unlike the single-file HTML charts, the bundle keeps data and code apart:
+
+- ``visuals/plotly.min.js`` is written once and shared by every page
+  (the pages from interactive_visualizations.py and city_comparison.py use
+  the same file), so nothing depends on a CDN.
+- Each dataset is stored once under ``data/<dataset>/`` as one small binary
+  file per City or Station: an int32 time column followed by one float32
+  column per measure, little-endian, NaN for missing values. A
+  ``manifest.json`` records the layout plus the small precomputed tables
+  (group means, correlations) the overview page needs.
+- The pages fetch a group's file only when it is selected, so what the
+  browser downloads grows with what the user looks at.
+
+Serve the folder over HTTP to view it (browsers block fetch() on file://):
+
+    python -m http.server 8000 --directory visuals
+    # http://localhost:8000/dashboard/index.html
+"""
+
+import json
+import logging
+import re
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VIS_PATH = Path(config.VISUALS_DIR)
+BUNDLE_PATH = VIS_PATH / "dashboard"
+PLOTLYJS_NAME = "plotly.min.js"
+
+DATASETS = ["city_day", "station_day", "station_hour", "city_hour"]
+
+DAY_MS = 86_400_000
+HOUR_MS = 3_600_000
+
+
+def write_plotlyjs(vis_path=VIS_PATH):
+    """Write plotly.js next to the visuals, once, and return its path."""
+    import plotly
+
+    out_path = Path(vis_path) / PLOTLYJS_NAME
+    bundled = Path(plotly.__file__).parent / "package_data" / PLOTLYJS_NAME
+    if out_path.exists() and bundled.exists() and out_path.stat().st_size == bundled.stat().st_size:
+        return out_path
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    if bundled.exists():
+        shutil.copyfile(bundled, out_path)
+    else:
+        from plotly.offline import get_plotlyjs
+        out_path.write_text(get_plotlyjs(), encoding="utf-8")
+    logging.info(f"Saved shared plotly.js: {out_path}")
+    return out_path
+
+
+def safe_name(group):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", str(group))
+
+
+def write_dataset(name, out_path=BUNDLE_PATH):
+    """Write one binary file per group plus the manifest; return the manifest."""
+    schema = get_schema(name)
+    if not Path(schema.path).exists():
+        logging.warning(f"File not found: {schema.path}. Skipping {name}.")
+        return None
+
+    key = schema.keys[-1]
+    measures = list(schema.measures)
+    # The bundle is served as the full-data dashboard, even in sample mode
+    df = load_dataset(name, columns=[key, schema.date_column] + measures, sample=0)
+    df = df.sort_values([key, schema.date_column], kind="stable")
+
+    unit_ms = HOUR_MS if schema.hourly else DAY_MS
+    times = (df[schema.date_column].to_numpy("datetime64[ms]").astype(np.int64) // unit_ms).astype("<i4")
+    values = df[measures].to_numpy(np.float32)
+    groups, starts = np.unique(df[key].to_numpy(), return_index=True)
+    bounds = np.append(starts, len(df))
+
+    data_dir = Path(out_path) / "data" / name
+    if data_dir.exists():
+        shutil.rmtree(data_dir)
+    data_dir.mkdir(parents=True)
+
+    manifest = {
+        "dataset": name,
+        "key": key,
+        "columns": measures,
+        "time_unit_ms": unit_ms,
+        "hourly": schema.hourly,
+        "groups": {},
+    }
+    for group, lo, hi in zip(groups, bounds[:-1], bounds[1:]):
+        file_name = safe_name(group) + ".bin"
+        with open(data_dir / file_name, "wb") as f:
+            f.write(times[lo:hi].tobytes())
+            # column-major so each measure is one contiguous Float32Array
+            f.write(np.ascontiguousarray(values[lo:hi].T).astype("<f4").tobytes())
+        manifest["groups"][str(group)] = {"file": file_name, "rows": int(hi - lo)}
+
+    # Small aggregates for the overview page, so it needs no series at all
+    means = df.groupby(key)[measures].mean()
+    manifest["means"] = {c: {str(g): _num(v) for g, v in means[c].items()} for c in measures}
+    corr = df[measures].corr()
+    manifest["correlation"] = [[_num(v) for v in row] for row in corr.to_numpy()]
+
+    with open(data_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    logging.info(f"Bundled {name}: {len(groups)} {key} files in {data_dir}")
+    return manifest
+
+
+def _num(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def write_pages(datasets, out_path=BUNDLE_PATH):
+    out_path = Path(out_path)
+    with open(out_path / "data" / "index.json", "w", encoding="utf-8") as f:
+        json.dump({"datasets": datasets}, f)
+    (out_path / "dashboard.js").write_text(DASHBOARD_JS, encoding="utf-8")
+    (out_path / "index.html").write_text(_page("Overview", OVERVIEW_BODY), encoding="utf-8")
+    (out_path / "trends.html").write_text(_page("Trends", TRENDS_BODY), encoding="utf-8")
+
+
+def _page(title, body):
+    return PAGE_TEMPLATE.replace("{title}", title).replace("{plotlyjs}", "../" + PLOTLYJS_NAME).replace("{body}", body)
+
+
+def bundle_size(out_path=BUNDLE_PATH):
+    return sum(p.stat().st_size for p in Path(out_path).rglob("*") if p.is_file())
+
+
+def main():
+    write_plotlyjs()
+    BUNDLE_PATH.mkdir(parents=True, exist_ok=True)
+    bundled = [name for name in DATASETS if write_dataset(name) is not None]
+    if not bundled:
+        logging.warning("No processed datasets found. Nothing to bundle.")
+        return
+    write_pages(bundled)
+    logging.info(f"Saved dashboard: {BUNDLE_PATH / 'index.html'} "
+                 f"({bundle_size() / 1e6:.1f} MB of data and pages, plotly.js shared)")
+
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Air Quality — {title}</title>
+<script src="{plotlyjs}"></script>
+<script src="dashboard.js"></script>
+<style>
+body { font-family: sans-serif; margin: 1.5em; }
+nav a { margin-right: 1em; }
+.controls { display: flex; gap: 1.5em; align-items: flex-start; margin: 1em 0; }
+.controls label { display: flex; flex-direction: column; font-size: 0.9em; }
+.chart { height: 560px; }
+</style>
+</head>
+<body>
+<nav><a href="index.html">Overview</a><a href="trends.html">Trends</a></nav>
+{body}
+</body>
+</html>
+"""
+
+OVERVIEW_BODY = """<h2>Overview</h2>
+<div class="controls">
+<label>Dataset <select id="dataset"></select></label>
+<label>Metric <select id="metric"></select></label>
+</div>
+<div id="ranking" class="chart"></div>
+<div id="correlation" class="chart"></div>
+<script>
+(async () => {
+  const datasetSel = document.getElementById("dataset");
+  const metricSel = document.getElementById("metric");
+  await AQI.fillDatasets(datasetSel);
+
+  async function draw() {
+    const m = await AQI.manifest(datasetSel.value);
+    AQI.fillOptions(metricSel, m.columns, metricSel.value || "AQI");
+    const means = Object.entries(m.means[metricSel.value])
+      .filter(([, v]) => v !== null).sort((a, b) => b[1] - a[1]).slice(0, 10);
+    Plotly.react("ranking", [{
+      type: "bar", x: means.map(e => e[0]), y: means.map(e => e[1]),
+      marker: {color: means.map(e => e[1]), colorscale: "Plasma"}
+    }], {title: `Top ${means.length} by average ${metricSel.value} (${m.key})`});
+    Plotly.react("correlation", [{
+      type: "heatmap", z: m.correlation, x: m.columns, y: m.columns,
+      colorscale: "RdBu", zmid: 0
+    }], {title: "Pollutant correlation matrix"});
+  }
+  datasetSel.onchange = () => { metricSel.value = ""; draw(); };
+  metricSel.onchange = draw;
+  draw();
+})();
+</script>
+"""
+
+TRENDS_BODY = """<h2>Trends</h2>
+<div class="controls">
+<label>Dataset <select id="dataset"></select></label>
+<label>Metric <select id="metric"></select></label>
+<label>Resolution <select id="resolution">
+<option value="monthly">Monthly mean</option>
+<option value="raw">As recorded</option>
+</select></label>
+<label>Series (Ctrl/Cmd-click for more) <select id="groups" multiple size="10"></select></label>
+</div>
+<div id="chart" class="chart"></div>
+<script>
+(async () => {
+  const datasetSel = document.getElementById("dataset");
+  const metricSel = document.getElementById("metric");
+  const resolutionSel = document.getElementById("resolution");
+  const groupsSel = document.getElementById("groups");
+  await AQI.fillDatasets(datasetSel);
+
+  async function reset() {
+    const m = await AQI.manifest(datasetSel.value);
+    AQI.fillOptions(metricSel, m.columns, "PM2.5");
+    AQI.fillOptions(groupsSel, Object.keys(m.groups));
+    groupsSel.options[0].selected = true;
+    draw();
+  }
+
+  async function draw() {
+    const dataset = datasetSel.value, metric = metricSel.value;
+    const selected = Array.from(groupsSel.selectedOptions, o => o.value);
+    // Only the selected groups are fetched; earlier fetches are cached
+    const series = await Promise.all(selected.map(g => AQI.load(dataset, g)));
+    const traces = series.map((s, i) => {
+      const xy = resolutionSel.value === "monthly" ? AQI.monthly(s, metric) : {x: s.x, y: s.columns[metric]};
+      return {type: "scattergl", mode: "lines", name: selected[i], x: xy.x, y: xy.y};
+    });
+    Plotly.react("chart", traces, {
+      title: `${metric} — ${dataset}`, xaxis: {title: "Date"}, yaxis: {title: metric}
+    });
+  }
+  datasetSel.onchange = reset;
+  metricSel.onchange = resolutionSel.onchange = groupsSel.onchange = draw;
+  reset();
+})();
+</script>
+"""
+
+DASHBOARD_JS = """// Shared loader for the bundled dashboard pages (see scripts/dashboard_bundle.py)
+const AQI = (() => {
+  const manifests = {};
+  const cache = {};
+
+  function json(url) {
+    return fetch(url).then(r => {
+      if (!r.ok) throw new Error(`${url}: ${r.status}`);
+      return r.json();
+    });
+  }
+
+  function manifest(dataset) {
+    if (!manifests[dataset]) manifests[dataset] = json(`data/${dataset}/manifest.json`);
+    return manifests[dataset];
+  }
+
+  // Fetch one group's binary file: int32 time units, then one float32 column per measure
+  function load(dataset, group) {
+    const key = `${dataset}/${group}`;
+    if (!cache[key]) {
+      cache[key] = manifest(dataset).then(async m => {
+        const g = m.groups[group];
+        const r = await fetch(`data/${dataset}/${g.file}`);
+        if (!r.ok) throw new Error(`${g.file}: ${r.status}`);
+        const buf = await r.arrayBuffer();
+        const n = g.rows;
+        const t = new Int32Array(buf, 0, n);
+        const x = Array.from(t, v => new Date(v * m.time_unit_ms));
+        const columns = {};
+        m.columns.forEach((c, i) => { columns[c] = new Float32Array(buf, 4 * n * (i + 1), n); });
+        return {x, columns};
+      });
+    }
+    return cache[key];
+  }
+
+  function monthly(series, metric) {
+    const y = series.columns[metric];
+    const sums = new Map();
+    series.x.forEach((d, i) => {
+      if (Number.isNaN(y[i])) return;
+      const k = d.getUTCFullYear() * 12 + d.getUTCMonth();
+      const s = sums.get(k) || [0, 0];
+      s[0] += y[i]; s[1] += 1;
+      sums.set(k, s);
+    });
+    const keys = Array.from(sums.keys()).sort((a, b) => a - b);
+    return {
+      x: keys.map(k => new Date(Date.UTC(Math.floor(k / 12), k % 12, 1))),
+      y: keys.map(k => sums.get(k)[0] / sums.get(k)[1])
+    };
+  }
+
+  function fillOptions(select, values, preferred) {
+    const current = select.value;
+    select.innerHTML = "";
+    values.forEach(v => select.add(new Option(v, v)));
+    if (values.includes(current)) select.value = current;
+    else if (values.includes(preferred)) select.value = preferred;
+  }
+
+  async function fillDatasets(select) {
+    const index = await json("data/index.json");
+    fillOptions(select, index.datasets, "city_day");
+  }
+
+  return {manifest, load, monthly, fillOptions, fillDatasets};
+})();
+"""
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Seasonal-trend decomposition of every City/Station x pollutant series.
+
+All series of a dataset are placed on one time grid and stacked into a
+(series x time) array. Each step is a NaN-aware moving average over that
+whole array, done with cumulative sums; there is no per-series model
+fitting. The steps follow the outline of STL:
+
+1. trend = centred moving average over one period;
+2. seasonal = the detrended values smoothed across cycles at each phase
+   (the same day of neighbouring years), then along the phase, so the
+   seasonal shape may drift from year to year; it is re-centred to mean
+   zero per cycle;
+3. trend is re-estimated from the deseasonalised series (``passes`` times);
+4. residual = observed - trend - seasonal.
+
+Components are cached in output/decomposition/<dataset>_components.npz,
+together with the options they were computed with. Forecasting and anomaly
+code should read them through ``get_components``, which recomputes them
+when the processed file is newer than the cache or the options differ:
+
+    from decomposition import get_components
+    comp = get_components("city_day")
+    delhi = comp.frame("Delhi", "PM2.5")   # Datetime, observed, trend, seasonal, resid
+
+    python scripts/aqi.py decompose --dataset station_day --seasonal-window 5
+"""
+
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DECOMPOSITION_DIR = os.path.join(config.OUTPUT_DIR, "decomposition")
+PERIODS = {"D": 365, "h": 24}  # yearly cycle for daily data, daily cycle for hourly data
+COMPONENTS = ("observed", "trend", "seasonal", "resid")
+
+
+@dataclass
+class Components:
+    """Decomposition of all series of a dataset; arrays are (groups, pollutants, time)."""
+    groups: np.ndarray
+    pollutants: np.ndarray
+    start: np.datetime64
+    period: int
+    observed: np.ndarray
+    trend: np.ndarray
+    seasonal: np.ndarray
+    resid: np.ndarray
+    settings: dict = field(default_factory=dict)
+
+    @property
+    def times(self):
+        return self.start + np.arange(self.observed.shape[-1])
+
+    def frame(self, group, pollutant):
+        """One series and its components as a DataFrame."""
+        import pandas as pd
+
+        g = int(np.flatnonzero(self.groups == group)[0])
+        p = int(np.flatnonzero(self.pollutants == pollutant)[0])
+        return pd.DataFrame({config.DATE_COLUMN: self.times.astype("datetime64[ns]"),
+                             **{c: getattr(self, c)[g, p] for c in COMPONENTS}})
+
+
+def _odd(n):
+    n = max(int(n), 1)
+    return n if n % 2 else n + 1
+
+
+def moving_average(values, window, min_fraction=0.5):
+    """
+    Centred, NaN-aware moving average along the last axis.
+
+    Windows are truncated at the edges; a result needs at least
+    ``min_fraction`` of the window to be non-missing, else it is NaN.
+    """
+    window = _odd(window)
+    half = window // 2
+    valid = ~np.isnan(values)
+    pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    sums = np.pad(np.cumsum(np.where(valid, values, 0.0), axis=-1), pad)
+    counts = np.pad(np.cumsum(valid, axis=-1), pad)
+    n = values.shape[-1]
+    hi = np.minimum(np.arange(n) + half + 1, n)
+    lo = np.maximum(np.arange(n) - half, 0)
+    total = sums[..., hi] - sums[..., lo]
+    count = counts[..., hi] - counts[..., lo]
+    need = np.maximum(np.ceil(min_fraction * (hi - lo)), 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count >= need, total / count, np.nan)
+
+
+def decompose(series, period, seasonal_window=3, phase_window=None, trend_window=None, passes=2):
+    """
+    Decompose the rows of ``series`` (series x time, NaN = missing).
+
+    ``seasonal_window`` is in cycles, ``phase_window`` and ``trend_window``
+    in time steps. Returns (trend, seasonal, resid) with the shape of
+    ``series``.
+    """
+    n_rows, length = series.shape
+    phase_window = phase_window or _odd(period // 24)
+    trend_window = trend_window or _odd(period)
+    cycles = -(-length // period)
+    padded = cycles * period
+
+    def seasonal_of(detrended):
+        # (rows, cycles, phase): smooth across cycles, then along the phase
+        cube = np.full((n_rows, padded), np.nan)
+        cube[:, :length] = detrended
+        cube = cube.reshape(n_rows, cycles, period)
+        smooth = moving_average(cube.swapaxes(1, 2), seasonal_window, min_fraction=0).swapaxes(1, 2)
+        if phase_window > 1:
+            # Wrap the phase so late December is smoothed with early January
+            half = phase_window // 2
+            wrapped = np.concatenate([smooth[..., -half:], smooth, smooth[..., :half]], axis=-1)
+            smooth = moving_average(wrapped, phase_window, min_fraction=0)[..., half:half + period]
+        # Zero mean within each cycle, so the level stays in the trend
+        smooth = smooth - _nanmean(smooth, axis=-1)
+        return smooth.reshape(n_rows, padded)[:, :length]
+
+    trend = moving_average(series, trend_window)
+    seasonal = np.zeros_like(series)
+    for _ in range(passes):
+        seasonal = np.nan_to_num(seasonal_of(series - trend))
+        trend = moving_average(series - seasonal, trend_window)
+    resid = series - trend - seasonal
+    return trend, seasonal, resid
+
+
+def _nanmean(values, axis):
+    valid = ~np.isnan(values)
+    total = np.where(valid, values, 0.0).sum(axis=axis, keepdims=True)
+    count = valid.sum(axis=axis, keepdims=True)
+    return np.where(count > 0, total / np.maximum(count, 1), 0.0)
+
+
+def stack_series(dataset, pollutants=None):
+    """(groups, pollutants, start, array groups x pollutants x time) on a regular grid."""
+    import pandas as pd
+
+    schema = get_schema(dataset)
+    key = schema.keys[-1]
+    pollutants = list(pollutants or schema.measures)
+    # Moving averages need unbroken series, so sample mode does not apply
+    df = load_dataset(dataset, columns=[key, schema.date_column] + pollutants, sample=0)
+    df = df.groupby([key, schema.date_column])[pollutants].mean().reset_index()
+
+    unit = "h" if schema.hourly else "D"
+    times = df[schema.date_column].to_numpy(f"datetime64[{unit}]")
+    start = times.min()
+    steps = (times - start).astype(np.int64)
+    codes, groups = pd.factorize(df[key], sort=True)
+    cube = np.full((len(groups), len(pollutants), int(steps.max()) + 1), np.nan)
+    cube[codes[:, None], np.arange(len(pollutants))[None, :], steps[:, None]] = df[pollutants].to_numpy(np.float64)
+    return np.asarray(groups, dtype=str), np.asarray(pollutants, dtype=str), start, cube
+
+
+def settings(dataset, pollutants=None, period=None, seasonal_window=3, phase_window=None, trend_window=None,
+             passes=2):
+    """Decomposition options with the defaults filled in, as stored with the cache."""
+    schema = get_schema(dataset)
+    period = int(period or PERIODS["h" if schema.hourly else "D"])
+    return {"pollutants": list(pollutants or schema.measures), "period": period,
+            "seasonal_window": _odd(seasonal_window), "phase_window": _odd(phase_window or period // 24),
+            "trend_window": _odd(trend_window or period), "passes": int(passes)}
+
+
+def compute_components(dataset, pollutants=None, period=None, **options):
+    opts = settings(dataset, pollutants, period, **options)
+    groups, names, start, cube = stack_series(dataset, opts["pollutants"])
+    n_groups, n_pollutants, length = cube.shape
+    flat = cube.reshape(n_groups * n_pollutants, length)
+    trend, seasonal, resid = decompose(flat, opts["period"], opts["seasonal_window"], opts["phase_window"],
+                                       opts["trend_window"], opts["passes"])
+    shape = cube.shape
+    return Components(groups, names, start, opts["period"], cube,
+                      trend.reshape(shape), seasonal.reshape(shape), resid.reshape(shape), opts)
+
+
+def cache_path(dataset):
+    return os.path.join(DECOMPOSITION_DIR, f"{dataset}_components.npz")
+
+
+def save_components(comp, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, groups=comp.groups, pollutants=comp.pollutants, start=np.array(comp.start),
+                        period=comp.period, settings=json.dumps(comp.settings),
+                        **{c: getattr(comp, c).astype(np.float32) for c in COMPONENTS})
+
+
+def load_components(path):
+    with np.load(path) as data:
+        # Caches written before the options were stored have none: never a match
+        opts = json.loads(str(data["settings"])) if "settings" in data.files else {}
+        return Components(data["groups"], data["pollutants"], data["start"][()], int(data["period"]),
+                          *(data[c].astype(np.float64) for c in COMPONENTS), opts)
+
+
+def get_components(dataset, refresh=False, **options):
+    """
+    Cached components of ``dataset`` (all pollutants, default options unless
+    given), recomputed if the cache is missing, older than the data or was
+    computed with other options.
+    """
+    path = cache_path(dataset)
+    source = get_schema(dataset).path
+    if not refresh and os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source):
+        comp = load_components(path)
+        if comp.settings == settings(dataset, **options):
+            return comp
+    comp = compute_components(dataset, **options)
+    save_components(comp, path)
+    return comp
+
+
+def strength(comp):
+    """Strength of trend and seasonality per series, in [0, 1] (Wang, Smith & Hyndman)."""
+    import pandas as pd
+
+    def explained(component):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ratio = np.nanvar(comp.resid, axis=-1) / np.nanvar(component + comp.resid, axis=-1)
+        return np.clip(1 - ratio, 0, 1)
+
+    # Seasonal amplitude per cycle, to show year-to-year change
+    n_groups, n_pollutants, length = comp.seasonal.shape
+    cycles = length // comp.period
+    amplitude = np.ptp(comp.seasonal[..., :cycles * comp.period].reshape(n_groups, n_pollutants, cycles,
+                                                                        comp.period), axis=-1)
+    g, p = np.meshgrid(np.arange(n_groups), np.arange(n_pollutants), indexing="ij")
+    return pd.DataFrame({
+        "group": comp.groups[g.ravel()],
+        "pollutant": comp.pollutants[p.ravel()],
+        "trend_strength": explained(comp.trend).ravel(),
+        "seasonal_strength": explained(comp.seasonal).ravel(),
+        "trend_change": (comp.trend[..., -1] - comp.trend[..., 0]).ravel(),
+        "seasonal_amplitude_first": amplitude[..., 0].ravel() if cycles else np.nan,
+        "seasonal_amplitude_last": amplitude[..., -1].ravel() if cycles else np.nan,
+        "resid_std": np.nanstd(comp.resid, axis=-1).ravel(),
+    })
+
+
+def main(dataset="city_day", pollutants=None, period=None, seasonal_window=3, trend_window=None, passes=2):
+    import time
+
+    schema = get_schema(dataset)
+    started = time.perf_counter()
+    comp = compute_components(dataset, pollutants, period, seasonal_window=seasonal_window,
+                              trend_window=trend_window, passes=passes)
+    elapsed = time.perf_counter() - started
+    n_series = comp.observed.shape[0] * comp.observed.shape[1]
+    logging.info(f"Decomposed {n_series} series x {comp.observed.shape[-1]} steps "
+                 f"(period {comp.period}) in {elapsed:.2f}s")
+
+    save_components(comp, cache_path(dataset))
+    logging.info(f"Cached components: {cache_path(dataset)}")
+    summary = strength(comp).rename(columns={"group": schema.keys[-1]})
+    out = os.path.join(DECOMPOSITION_DIR, f"{dataset}_summary.csv")
+    summary.to_csv(out, index=False)
+    logging.info(f"Saved decomposition summary: {out}")
+
+    aqi = summary[summary["pollutant"] == "AQI"]
+    if not aqi.empty:
+        print(f"\nAQI decomposition ({dataset}):")
+        print(aqi.drop(columns="pollutant").to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Derive city_hour from station_hour by streaming aggregation.
+
+station_hour is read in chunks and never held in memory as a whole. Each
+chunk is aggregated on an integer (hour, City) key, with one hash-group
+pass: per-pollutant sums and counts, plus the distinct stations
+reporting. The partial result is then merged with the groups carried over
+from earlier chunks. The input is ordered by Datetime, so every hour
+before the last one seen in a chunk is complete. Those hours are written
+out at once and only the last hour is carried forward, so memory stays
+bounded by the chunk size. If a row turns up for an hour that may
+already have been written, the file is read again from the start, and
+this time all groups are kept until the end. Memory is then bounded by
+the size of the output, not the input.
+
+City values are station means. AQI_Bucket is derived from the mean AQI
+using config.AQI_CATEGORIES. Next to the processed file,
+city_hour_coverage.csv records, for each hour, how many stations
+reported, how many the city has (from stations.csv) and their ratio.
+
+    python scripts/aqi.py derive-city-hour            # raw and processed
+    python scripts/aqi.py derive-city-hour --chunksize 2000000
+"""
+
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import aqi_bucket, get_schema, parse_dates, read_header, validate_header
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+COVERAGE_FILE = os.path.join(config.PROCESSED_DATA_DIR, "city_hour_coverage.csv")
+MAX_CITIES = 1 << 20  # key = hour * MAX_CITIES + city code
+
+
+class _Unordered(Exception):
+    """station_hour rows are not in Datetime order."""
+
+
+class _Codes:
+    """Stable integer codes for labels seen across chunks."""
+
+    def __init__(self):
+        import pandas as pd
+
+        self.labels = pd.Index([], dtype=object)
+
+    def encode(self, values):
+        codes = self.labels.get_indexer(values)
+        if (codes < 0).any():
+            new = values[codes < 0].unique()
+            self.labels = self.labels.append(type(self.labels)(new, dtype=object))
+            codes = self.labels.get_indexer(values)
+        return codes
+
+
+def aggregate(keys, sums, counts, pair_keys, pair_stations, n_stations):
+    """
+    Group rows (or partial groups) by key.
+
+    Returns sorted unique keys, summed ``sums`` and ``counts`` per key and the
+    distinct (key, station) pairs.
+    """
+    import pandas as pd
+
+    groups, unique = pd.factorize(keys, sort=True)
+    n = len(unique)
+    out_sums = np.empty((n, sums.shape[1]))
+    out_counts = np.empty((n, sums.shape[1]))
+    for j in range(sums.shape[1]):
+        out_sums[:, j] = np.bincount(groups, weights=sums[:, j], minlength=n)
+        out_counts[:, j] = np.bincount(groups, weights=counts[:, j], minlength=n)
+    pair_groups = np.searchsorted(unique, pair_keys)
+    pairs = np.unique(pair_groups.astype(np.int64) * n_stations + pair_stations)
+    return unique, out_sums, out_counts, unique[pairs // n_stations], pairs % n_stations
+
+
+def _expected_stations():
+    # Stations per city, from the stations list if there is one
+    import pandas as pd
+
+    path = config.STATIONS_CLEANED if os.path.exists(config.STATIONS_CLEANED) else config.STATIONS_RAW
+    if not os.path.exists(path):
+        return {}
+    stations = pd.read_csv(path, usecols=["City", "Station"], dtype=str)
+    return stations.groupby("City")["Station"].nunique().to_dict()
+
+
+def derive(source, target, coverage=None, chunksize=1_000_000):
+    """Stream ``source`` (station_hour) into ``target`` (city_hour); returns (rows in, rows out, seconds)."""
+    import pandas as pd
+
+    station_schema = get_schema("station_hour")
+    city_schema = get_schema("city_hour")
+    measures = [m for m in city_schema.measures if m in station_schema.measures]
+    validate_header("station_hour", read_header(source))
+    expected = _expected_stations()
+
+    cities, stations = _Codes(), _Codes()
+    dtype = {"City": str, "Station": str, config.DATE_COLUMN: str, **{m: "float64" for m in measures}}
+    tmp = target + ".tmp"
+    tmp_coverage = coverage + ".tmp" if coverage else None
+    rows_out = 0
+    started = time.perf_counter()
+
+    def write(keys, sums, counts, pair_keys):
+        nonlocal rows_out
+        if not len(keys):
+            return
+        hours, codes = keys // MAX_CITIES, keys % MAX_CITIES
+        names = np.asarray(cities.labels, dtype=object)[codes]
+        # Within an hour, cities in name order
+        order = np.lexsort((names, hours))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Rounded to well below the input precision so the CSV writer's
+            # shortest repr stays short (float_format is far slower)
+            means = np.round(np.where(counts > 0, sums / counts, np.nan), 6)[order]
+        n_stations = np.bincount(np.searchsorted(keys, pair_keys), minlength=len(keys))[order]
+        # Each hour repeats once per city: format the distinct hours only
+        distinct, inverse = np.unique(hours[order], return_inverse=True)
+        stamps = pd.DatetimeIndex(distinct.astype("datetime64[h]").astype("datetime64[ns]")) \
+            .strftime(config.DATE_FORMAT_HOURLY).to_numpy(object)[inverse]
+        out = pd.DataFrame({"City": names[order], config.DATE_COLUMN: stamps})
+        out[measures] = means
+        if "AQI" in measures and "AQI_Bucket" in city_schema.columns:
+            out["AQI_Bucket"] = aqi_bucket(out["AQI"].to_numpy())
+        out = out[[c for c in city_schema.columns if c in out]]
+        out.to_csv(tmp, mode="a", header=not os.path.exists(tmp), index=False)
+        if tmp_coverage:
+            cov = pd.DataFrame({"City": out["City"], config.DATE_COLUMN: stamps, "stations": n_stations})
+            cov["stations_expected"] = cov["City"].map(expected).astype("Int64")
+            cov["coverage"] = (cov["stations"] / cov["stations_expected"]).round(4)
+            cov.to_csv(tmp_coverage, mode="a", header=not os.path.exists(tmp_coverage), index=False)
+        rows_out += len(out)
+
+    def stream(ordered):
+        # One pass over the file; raises _Unordered if ``ordered`` turns out
+        # wrong after some hours were already written
+        nonlocal rows_out
+        for path in (tmp, tmp_coverage):
+            if path and os.path.exists(path):
+                os.remove(path)
+        rows_out = rows_in = 0
+        carry, last_hour = None, None
+        for chunk in pd.read_csv(source, usecols=list(dtype), dtype=dtype, chunksize=chunksize):
+            carry, last_hour = step(chunk, carry, last_hour, ordered)
+            rows_in += len(chunk)
+        if carry is not None:
+            write(carry[0], carry[1], carry[2], carry[3])
+        return rows_in
+
+    def step(chunk, carry, last_hour, ordered):
+        hours = parse_dates("station_hour", chunk[config.DATE_COLUMN]).to_numpy("datetime64[h]").astype(np.int64)
+        if ordered and ((np.diff(hours) < 0).any() or (last_hour is not None and hours[0] < last_hour)):
+            raise _Unordered
+        last_hour = hours[-1] if last_hour is None else max(last_hour, hours[-1])
+
+        keys = hours * MAX_CITIES + cities.encode(chunk["City"])
+        values = chunk[measures].to_numpy(np.float64)
+        valid = ~np.isnan(values)
+        station_codes = stations.encode(chunk["Station"])
+        parts = [(keys, np.where(valid, values, 0.0), valid.astype(np.float64), keys, station_codes)]
+        if carry is not None:
+            parts.insert(0, carry)
+        merged = aggregate(np.concatenate([p[0] for p in parts]),
+                           np.vstack([p[1] for p in parts]),
+                           np.vstack([p[2] for p in parts]),
+                           np.concatenate([p[3] for p in parts]),
+                           np.concatenate([p[4] for p in parts]),
+                           n_stations=len(stations.labels))
+        group_keys, sums, counts, pair_keys, pair_stations = merged
+
+        if ordered:
+            # Every hour before the last one in this chunk is complete
+            done = group_keys // MAX_CITIES < last_hour
+            pair_done = pair_keys // MAX_CITIES < last_hour
+            write(group_keys[done], sums[done], counts[done], pair_keys[pair_done])
+            return (group_keys[~done], sums[~done], counts[~done], pair_keys[~pair_done],
+                    pair_stations[~pair_done]), last_hour
+        return merged, last_hour
+
+    try:
+        rows_in = stream(ordered=True)
+    except _Unordered:
+        # Hours already written may get more rows: start over and hold every
+        # group until the end of the file
+        logging.warning(f"{source} is not ordered by {config.DATE_COLUMN}; "
+                        f"re-reading it and holding all groups until the end of the file")
+        rows_in = stream(ordered=False)
+    elapsed = time.perf_counter() - started
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(tmp, target)
+    if tmp_coverage:
+        os.replace(tmp_coverage, coverage)
+    return rows_in, rows_out, elapsed
+
+
+def main(sources=("raw", "processed"), chunksize=1_000_000):
+    targets = {
+        "raw": (config.STATION_HOUR_RAW, config.CITY_HOUR_RAW, None),
+        "processed": (config.STATION_HOUR_CLEANED, config.CITY_HOUR_CLEANED, COVERAGE_FILE),
+    }
+    status = 0
+    for name in sources:
+        source, target, coverage = targets[name]
+        if not os.path.exists(source):
+            logging.warning(f"{source} not found; cannot derive {target}")
+            status = 1
+            continue
+        rows_in, rows_out, elapsed = derive(source, target, coverage, chunksize)
+        rate = rows_in / elapsed / 1e6 if elapsed else float("inf")
+        logging.info(f"Derived {target}: {rows_in} station rows -> {rows_out} city rows "
+                     f"in {elapsed:.2f}s ({rate:.2f} M rows/s)")
+        if coverage:
+            logging.info(f"Saved station coverage: {coverage}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
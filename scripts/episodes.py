@@ -0,0 +1,149 @@
+"""
+Pollution episode detection: runs of consecutive days (or hours) at or above
+an AQI category, per City or Station.
+
+The category thresholds come from ``config.AQI_CATEGORIES``; an episode for
+"Poor" is any run of consecutive periods with AQI > 200, the top of
+"Moderate" (Poor or worse, so 200.5 counts as well).
+The series is sorted once by (group, Datetime) and each category is handled
+with NumPy run-length encoding: a run starts wherever the flag turns on, the
+group changes or a period is missing, and ``np.*.reduceat`` gives each run's
+length, peak and mean. There are no per-row Python loops.
+
+    python scripts/aqi.py episodes --dataset station_hour --min-duration 6
+"""
+
+import logging
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+EPISODES_DIR = os.path.join(config.OUTPUT_DIR, "episodes")
+EPISODE_COLUMNS = ["category", "start", "end", "duration", "peak", "mean"]
+
+
+def category_thresholds(categories=None):
+    """
+    {category: AQI to exceed} for the requested categories, mildest first.
+
+    The threshold is the upper bound of the category below, so values
+    between two integer ranges (50.5, 200.5) still fall in a category.
+    """
+    names = categories or [c for c in config.AQI_CATEGORIES if c != "Good"]
+    unknown = [c for c in names if c not in config.AQI_CATEGORIES]
+    if unknown:
+        raise ValueError(f"Unknown AQI categories {unknown}; expected {list(config.AQI_CATEGORIES)}")
+    uppers = [-np.inf] + [c["range"][1] for c in config.AQI_CATEGORIES.values()]
+    return {c: uppers[i] for i, c in enumerate(config.AQI_CATEGORIES) if c in names}
+
+
+def find_runs(codes, steps, values, threshold):
+    """
+    Run-length encode ``values > threshold`` over sorted series.
+
+    ``codes`` are group codes and ``steps`` integer time steps (days or
+    hours), both sorted by (code, step). Returns index arrays (first, last)
+    of each run plus its peak and mean.
+    """
+    flag = values > threshold  # NaN compares False and breaks a run
+    idx = np.flatnonzero(flag)
+    if not len(idx):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([]), np.array([])
+    # A flagged row continues a run only if the previous row is flagged,
+    # in the same group and exactly one step earlier.
+    continues = np.zeros(len(idx), dtype=bool)
+    continues[1:] = ((idx[1:] - idx[:-1]) == 1) \
+        & (codes[idx[1:]] == codes[idx[:-1]]) \
+        & (steps[idx[1:]] - steps[idx[:-1]] == 1)
+    run_starts = np.flatnonzero(~continues)
+    first = idx[run_starts]
+    last = idx[np.append(run_starts[1:], len(idx)) - 1]
+    flagged = values[idx]
+    peak = np.maximum.reduceat(flagged, run_starts)
+    mean = np.add.reduceat(flagged, run_starts) / np.diff(np.append(run_starts, len(idx)))
+    return first, last, peak, mean
+
+
+def detect_episodes(df, key, metric="AQI", categories=None, hourly=False,
+                    min_duration=1, date_col=config.DATE_COLUMN):
+    """Return a DataFrame of episodes per group and category."""
+    import pandas as pd
+
+    df = df.sort_values([key, date_col], kind="stable")
+    codes, labels = pd.factorize(df[key])
+    unit = "h" if hourly else "D"
+    times = df[date_col].to_numpy(f"datetime64[{unit}]")
+    steps = times.astype(np.int64)
+    values = df[metric].to_numpy(np.float64)
+
+    frames = []
+    for category, threshold in category_thresholds(categories).items():
+        first, last, peak, mean = find_runs(codes, steps, values, threshold)
+        duration = last - first + 1
+        keep = duration >= min_duration
+        frames.append(pd.DataFrame({
+            key: np.asarray(labels)[codes[first[keep]]],
+            "category": category,
+            "start": times[first[keep]],
+            "end": times[last[keep]],
+            "duration": duration[keep],
+            "peak": peak[keep],
+            "mean": mean[keep],
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[key] + EPISODE_COLUMNS)
+
+
+def summarize_episodes(episodes, key):
+    """Per group and category: episode count, total periods and the longest run."""
+    if episodes.empty:
+        return episodes
+    longest = episodes.loc[episodes.groupby([key, "category"], sort=False)["duration"].idxmax()]
+    totals = episodes.groupby([key, "category"], sort=False).agg(
+        episodes=("duration", "size"), total_periods=("duration", "sum"))
+    summary = totals.join(longest.set_index([key, "category"])[["duration", "start", "end", "peak"]]
+                          .rename(columns={"duration": "longest", "start": "longest_start",
+                                           "end": "longest_end", "peak": "longest_peak"}))
+    return summary.reset_index()
+
+
+def main(dataset="city_day", metric="AQI", categories=None, min_duration=1):
+    schema = get_schema(dataset)
+    key = schema.keys[-1]
+    os.makedirs(EPISODES_DIR, exist_ok=True)
+
+    # An episode is a run of consecutive periods, so sample mode does not apply
+    df = load_dataset(dataset, columns=[key, schema.date_column, metric], sample=0)
+    episodes = detect_episodes(df, key, metric, categories, schema.hourly, min_duration)
+    summary = summarize_episodes(episodes, key)
+
+    out = os.path.join(EPISODES_DIR, f"{dataset}_episodes.csv")
+    episodes.to_csv(out, index=False, date_format=schema.date_format)
+    logging.info(f"Saved {len(episodes)} episodes: {out}")
+    out = os.path.join(EPISODES_DIR, f"{dataset}_episode_summary.csv")
+    summary.to_csv(out, index=False, date_format=schema.date_format)
+    logging.info(f"Saved episode summary: {out}")
+
+    unit = "hours" if schema.hourly else "days"
+    stamp = "%Y-%m-%d %H:%M" if schema.hourly else "%Y-%m-%d"
+    for category in category_thresholds(categories):
+        rows = summary[summary["category"] == category].sort_values("longest", ascending=False)
+        if rows.empty:
+            continue
+        print(f"\nLongest '{category} or worse' episodes ({metric}):")
+        for _, row in rows.head(10).iterrows():
+            print(f"  {row[key]}: {row['longest']} {unit} "
+                  f"({row['longest_start']:{stamp}} to {row['longest_end']:{stamp}}), "
+                  f"{row['episodes']} episodes in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,67 +1,108 @@
+import csv
 import os
-import pandas as pd
-
-OUTPUT = "../output/"
-VISUALS = "../visuals/"
-
-os.makedirs(OUTPUT, exist_ok=True)
-
-# Load key outputs if they exist
-summary_lines = []
-summary_lines.append("# Summary Report\n")
-summary_lines.append("Generated from processed outputs and visuals.\n")
-
-# Top polluted cities
-try:
-    top = pd.read_csv(os.path.join(OUTPUT, "top_polluted_cities.csv"))
-    summary_lines.append("## Top Polluted Cities (Avg AQI)\n")
-    for i, row in top.head(10).iterrows():
-        summary_lines.append(f"- {row['City']}: {row['AQI']:.1f}\n")
-    summary_lines.append("\n")
-except Exception:
-    summary_lines.append("## Top Polluted Cities (data not available)\n\n")
-
-# Stations summary
-try:
-    stations = pd.read_csv(os.path.join(OUTPUT, "stations_summary.csv"))
-    summary_lines.append("## Stations Summary\n")
-    for i, row in stations.head(10).iterrows():
-        summary_lines.append(f"- {row['City']}: {int(row['Station'])} stations\n")
-    summary_lines.append("\n")
-except Exception:
-    summary_lines.append("## Stations Summary (data not available)\n\n")
-
-# Seasonal means
-try:
-    season = pd.read_csv(os.path.join(OUTPUT, "seasonal_means_by_pollutant.csv"))
-    summary_lines.append("## Seasonal Means by Pollutant\n")
-    summary_lines.append(season.to_markdown(index=False))
-    summary_lines.append("\n\n")
-except Exception:
-    summary_lines.append("## Seasonal Means (data not available)\n\n")
-
-# Missing values summary
-try:
-    mv = pd.read_csv(os.path.join(OUTPUT, "missing_values_summary.csv"))
-    summary_lines.append("## Missing Values Summary\n")
-    summary_lines.append(mv.to_markdown(index=False))
-    summary_lines.append("\n\n")
-except Exception:
-    summary_lines.append("## Missing Values Summary (data not available)\n\n")
-
-# Link to visuals
-summary_lines.append("## Visuals\n")
-if os.path.exists(VISUALS):
-    for f in sorted(os.listdir(VISUALS)):
-        if f.endswith('.png') or f.endswith('.html'):
-            summary_lines.append(f"- {os.path.join('visuals', f)}\n")
-
-summary_lines.append("\n## How to regenerate this summary\n")
-summary_lines.append("Run `python scripts/generate_summary.py` from the `scripts/` folder or from the repo root.\n")
-
-# Write summary
-out_file = os.path.join(OUTPUT, "summary_report.md")
-with open(out_file, 'w', encoding='utf-8') as f:
-    f.writelines([line + '\n' if not line.endswith('\n') else line for line in summary_lines])
-
-print("Created:", out_file)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+
+# Only reads the small CSVs in output/, so the stdlib csv module is enough and
+# the summary does not pay for importing pandas.
+OUTPUT = config.OUTPUT_DIR
+VISUALS = config.VISUALS_DIR
+
+
+def read_rows(name):
+    with open(os.path.join(OUTPUT, name), newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def to_markdown(rows):
+    # Render a list of dicts as a GitHub pipe table
+    headers = list(rows[0].keys()) if rows else []
+    lines = ["| " + " | ".join(headers) + " |",
+             "|" + "|".join(["---"] * len(headers)) + "|"]
+    for row in rows:
+        lines.append("| " + " | ".join(_fmt(row[h]) for h in headers) + " |")
+    return "\n".join(lines)
+
+
+def _fmt(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value or ""
+    return str(int(number)) if number.is_integer() else f"{number:.4g}"
+
+
+def main():
+    os.makedirs(OUTPUT, exist_ok=True)
+
+    # Load key outputs if they exist
+    summary_lines = []
+    summary_lines.append("# Summary Report\n")
+    summary_lines.append("Generated from processed outputs and visuals.\n")
+    if 0 < config.SAMPLE_FRACTION < 1:
+        summary_lines.append(f"**Sampled run:** {config.SAMPLE_FRACTION:.0%} of the rows of every City × year × month "
+                             f"(seed {config.SAMPLE_SEED}). Means are stratified estimates; their "
+                             f"{config.SAMPLE_CONFIDENCE:.0%} confidence intervals are in the *_ci.csv files "
+                             f"next to each table.\n")
+
+    # Top polluted cities
+    try:
+        top = read_rows("top_polluted_cities.csv")
+        summary_lines.append("## Top Polluted Cities (Avg AQI)\n")
+        for row in top[:10]:
+            summary_lines.append(f"- {row['City']}: {float(row['AQI']):.1f}\n")
+        summary_lines.append("\n")
+    except Exception:
+        summary_lines.append("## Top Polluted Cities (data not available)\n\n")
+
+    # Stations summary
+    try:
+        stations = read_rows("stations_summary.csv")
+        summary_lines.append("## Stations Summary\n")
+        for row in stations[:10]:
+            summary_lines.append(f"- {row['City']}: {int(float(row['Station']))} stations\n")
+        summary_lines.append("\n")
+    except Exception:
+        summary_lines.append("## Stations Summary (data not available)\n\n")
+
+    # Seasonal means
+    try:
+        season = read_rows("seasonal_means_by_pollutant.csv")
+        summary_lines.append("## Seasonal Means by Pollutant\n")
+        summary_lines.append(to_markdown(season))
+        summary_lines.append("\n\n")
+    except Exception:
+        summary_lines.append("## Seasonal Means (data not available)\n\n")
+
+    # Missing values summary
+    try:
+        mv = read_rows("missing_values_summary.csv")
+        summary_lines.append("## Missing Values Summary\n")
+        summary_lines.append(to_markdown(mv))
+        summary_lines.append("\n\n")
+    except Exception:
+        summary_lines.append("## Missing Values Summary (data not available)\n\n")
+
+    # Link to visuals
+    summary_lines.append("## Visuals\n")
+    if os.path.exists(VISUALS):
+        for f in sorted(os.listdir(VISUALS)):
+            if f.endswith('.png') or f.endswith('.html'):
+                summary_lines.append(f"- {os.path.join('visuals', f)}\n")
+
+    summary_lines.append("\n## How to regenerate this summary\n")
+    summary_lines.append("Run `python scripts/aqi.py summary` (or `python scripts/generate_summary.py`) from any directory.\n")
+
+    # Write summary
+    out_file = os.path.join(OUTPUT, "summary_report.md")
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.writelines([line + '\n' if not line.endswith('\n') else line for line in summary_lines])
+
+    print("Created:", out_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Gap imputation for every City/Station x pollutant series at once.
+
+The long-format table is sorted once by (group, Datetime). Periods missing
+inside a group's date range are inserted as empty rows, so a skipped day is
+a gap like any other. Each pollutant is then filled column-wise with NumPy:
+
+- ``interpolate`` (``config.IMPUTATION_METHODS['numeric']``): linear in time
+  between the previous and next reading of the same group. The indices of
+  those readings come from running max/min accumulations that reset at
+  group boundaries, so values never leak from one city into another.
+  Gaps longer than ``max_gap`` periods, and the ends of a series, are left
+  empty.
+- ``neighbour``: the mean of the other stations in the same city at the
+  same timestamp (station datasets only).
+
+Methods run in the order given; each only fills what is still missing.
+Apart from the initial sort, every step is linear in the number of rows.
+A mask records how each value was obtained (0 observed or still missing,
+1 interpolated, 2 neighbouring stations).
+
+    python scripts/aqi.py impute --dataset station_day --methods interpolate neighbour --max-gap 7
+"""
+
+import logging
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import aqi_bucket, get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+IMPUTED_DIR = os.path.join(config.OUTPUT_DIR, "imputed")
+METHODS = {"interpolate": 1, "neighbour": 2}
+
+
+def complete_grid(codes, steps):
+    """
+    Every step between the first and last reading of each group.
+
+    ``codes`` and ``steps`` must be sorted by (code, step) without duplicate
+    pairs. Returns (grid codes, grid steps, position of each input row in
+    the grid).
+    """
+    n_groups = int(codes.max()) + 1
+    first = np.full(n_groups, np.iinfo(np.int64).max)
+    last = np.full(n_groups, np.iinfo(np.int64).min)
+    np.minimum.at(first, codes, steps)
+    np.maximum.at(last, codes, steps)
+    present = first <= last
+    lengths = np.where(present, last - first + 1, 0)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    grid_codes = np.repeat(np.arange(n_groups), lengths)
+    grid_steps = np.arange(lengths.sum()) - offsets[grid_codes] + first[grid_codes]
+    positions = offsets[codes] + steps - first[codes]
+    return grid_codes, grid_steps, positions
+
+
+def _group_bounds(codes):
+    # Index of the first and last row of each row's group (codes sorted)
+    n = len(codes)
+    idx = np.arange(n)
+    new = np.ones(n, dtype=bool)
+    new[1:] = codes[1:] != codes[:-1]
+    end = np.ones(n, dtype=bool)
+    end[:-1] = new[1:]
+    first = np.maximum.accumulate(np.where(new, idx, 0))
+    last = np.minimum.accumulate(np.where(end, idx, n)[::-1])[::-1]
+    return first, last
+
+
+def interpolate_groups(codes, steps, values, max_gap=None):
+    """
+    Linear interpolation in time within each group.
+
+    ``values`` has shape (rows, columns) and is sorted like ``codes`` and
+    ``steps``. Returns (filled copy, boolean mask of interpolated values).
+    """
+    n = len(codes)
+    idx = np.arange(n)
+    first, last = _group_bounds(codes)
+    filled = values.copy()
+    mask = np.zeros(values.shape, dtype=bool)
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        valid = ~np.isnan(column)
+        prev = np.maximum.accumulate(np.where(valid, idx, -1))
+        nxt = np.minimum.accumulate(np.where(valid, idx, n)[::-1])[::-1]
+        gap = ~valid & (prev >= first) & (nxt <= last)
+        if max_gap is not None:
+            # Missing periods between the two readings
+            gap &= steps[np.minimum(nxt, n - 1)] - steps[np.maximum(prev, 0)] - 1 <= max_gap
+        rows = np.flatnonzero(gap)
+        lo, hi = prev[rows], nxt[rows]
+        weight = (steps[rows] - steps[lo]) / (steps[hi] - steps[lo])
+        filled[rows, j] = column[lo] + weight * (column[hi] - column[lo])
+        mask[rows, j] = True
+    return filled, mask
+
+
+def neighbour_fill(city_codes, steps, values):
+    """
+    Fill missing values with the mean of the other stations of the same
+    city at the same step. Returns (filled copy, boolean mask of filled values).
+    """
+    import pandas as pd
+
+    origin = steps.min()
+    span = steps.max() - origin + 1
+    cells, _ = pd.factorize(city_codes.astype(np.int64) * span + (steps - origin))
+    n = int(cells.max()) + 1 if len(cells) else 0
+    filled = values.copy()
+    mask = np.zeros(values.shape, dtype=bool)
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        valid = ~np.isnan(column)
+        sums = np.bincount(cells[valid], weights=column[valid], minlength=n)
+        counts = np.bincount(cells[valid], minlength=n)
+        # A missing value contributes nothing, so the cell mean is the mean of the others
+        rows = np.flatnonzero(~valid & (counts[cells] > 0))
+        filled[rows, j] = sums[cells[rows]] / counts[cells[rows]]
+        mask[rows, j] = True
+    return filled, mask
+
+
+def impute(df, key, columns, hourly=False, methods=("interpolate",), max_gap=None,
+           complete=True, city_key="City", date_col=config.DATE_COLUMN):
+    """
+    Impute ``columns`` of a long-format frame.
+
+    Returns (imputed frame sorted by (key, Datetime), mask frame of uint8
+    codes from ``METHODS``). With ``complete``, periods missing inside a
+    group's date range are added as rows first.
+    """
+    import pandas as pd
+
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown:
+        raise ValueError(f"Unknown imputation methods {unknown}; expected {list(METHODS)}")
+    if "neighbour" in methods and city_key == key:
+        raise ValueError("Neighbouring-station fill needs a station dataset")
+
+    codes, labels = pd.factorize(df[key])
+    unit = "h" if hourly else "D"
+    steps = df[date_col].to_numpy(f"datetime64[{unit}]").astype(np.int64)
+    order = np.lexsort((steps, codes))
+    codes, steps = codes[order], steps[order]
+    values = df[columns].to_numpy(np.float64)[order]
+    if ((codes[1:] == codes[:-1]) & (steps[1:] == steps[:-1])).any():
+        raise ValueError(f"Duplicate ({key}, {date_col}) rows; deduplicate before imputing")
+
+    if complete and len(codes):
+        codes, steps, positions = complete_grid(codes, steps)
+        grid = np.full((len(codes), len(columns)), np.nan)
+        grid[positions] = values
+        values = grid
+        logging.info(f"Inserted {len(codes) - len(positions)} missing periods")
+
+    out = pd.DataFrame({key: np.asarray(labels, dtype=object)[codes],
+                        date_col: steps.astype(f"datetime64[{unit}]").astype("datetime64[ns]")})
+    if city_key != key and city_key in df:
+        # Each station belongs to one city
+        city_of = pd.Series(df[city_key].to_numpy(), index=df[key].to_numpy()).groupby(level=0).first()
+        out.insert(0, city_key, city_of.reindex(labels).to_numpy()[codes])
+
+    missing = int(np.isnan(values).sum())
+    mask = np.zeros(values.shape, dtype=np.uint8)
+    for method in methods:
+        if method == "interpolate":
+            values, filled = interpolate_groups(codes, steps, values, max_gap)
+        else:
+            city_codes, _ = pd.factorize(out[city_key])
+            values, filled = neighbour_fill(city_codes, steps, values)
+        mask[filled] = METHODS[method]
+        logging.info(f"{method}: filled {int(filled.sum())} of {missing} missing values")
+
+    index_columns = list(out.columns)
+    out[columns] = values
+    mask = pd.concat([out[index_columns], pd.DataFrame(mask, columns=columns)], axis=1)
+    return out, mask
+
+
+def main(dataset="station_day", methods=None, max_gap=None, complete=True):
+    schema = get_schema(dataset)
+    key = schema.keys[-1]
+    methods = methods or [config.IMPUTATION_METHODS["numeric"]]
+    if "neighbour" in methods and "Station" not in schema.keys:
+        logging.error(f"{dataset} has no stations to fill from; use neighbour with station_day or station_hour")
+        return 1
+    columns = list(schema.measures)
+    os.makedirs(IMPUTED_DIR, exist_ok=True)
+
+    # Gaps are filled from neighbouring rows, so sample mode does not apply
+    df = load_dataset(dataset, sample=0)
+    imputed, mask = impute(df, key, columns, schema.hourly, methods, max_gap, complete)
+    # Observed rows keep their bucket; imputed AQI values get the bucket of their range
+    imputed = imputed.merge(df[[key, schema.date_column, "AQI_Bucket"]], how="left",
+                            on=[key, schema.date_column])
+    filled = mask["AQI"].to_numpy() > 0
+    imputed.loc[filled, "AQI_Bucket"] = aqi_bucket(imputed.loc[filled, "AQI"].to_numpy())
+    imputed = imputed[[c for c in schema.columns if c in imputed]]
+    mask = mask[[c for c in schema.columns if c in mask]]
+
+    out = os.path.join(IMPUTED_DIR, f"{dataset}_imputed.csv")
+    imputed.to_csv(out, index=False, date_format=schema.date_format, float_format="%.10g")
+    logging.info(f"Saved {len(imputed)} rows: {out}")
+    out = os.path.join(IMPUTED_DIR, f"{dataset}_imputed_mask.csv")
+    mask.to_csv(out, index=False, date_format=schema.date_format)
+    logging.info(f"Saved imputation mask ({', '.join(f'{v} = {k}' for k, v in METHODS.items())}): {out}")
+
+    counts = {m: int((mask[columns].to_numpy() == code).sum()) for m, code in METHODS.items() if m in methods}
+    still_missing = int(imputed[columns].isna().sum().sum())
+    print(f"\n{dataset}: imputed {counts}, {still_missing} values still missing")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,25 @@
+import sys
+import logging
+from pathlib import Path
+
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import os
-import logging
-from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import load_dataset
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-BASE_DIR = Path(__file__).resolve().parents[1]
-CLEAN_PATH = BASE_DIR / 'data' / 'processed'
-VIS_PATH = BASE_DIR / 'visuals'
+CLEAN_PATH = Path(config.PROCESSED_DATA_DIR)
+VIS_PATH = Path(config.VISUALS_DIR)
 
-# Ensure output directory exists
-VIS_PATH.mkdir(parents=True, exist_ok=True)
+
+def dataset_name(filename):
+    # "city_day_cleaned.csv" -> "city_day"
+    return filename.replace("_cleaned.csv", "").replace(".csv", "")
 
 def create_interactive_pm25_trend(filename):
     """Create interactive PM2.5 trend plot."""
@@ -22,13 +28,12 @@ def create_interactive_pm25_trend(filename):
         logging.warning(f"File not found: {file_path}. Skipping.")
         return
 
-    df = pd.read_csv(file_path)
+    df = load_dataset(dataset_name(filename), path=file_path)
 
     if "Datetime" not in df.columns or "PM2.5" not in df.columns:
         logging.warning(f"Required columns not found in {filename}. Skipping.")
         return
 
-    df['Datetime'] = pd.to_datetime(df['Datetime'])
     df = df.dropna(subset=['PM2.5'])
 
     # Reduce size by focusing on top cities and using monthly resampling
@@ -50,8 +55,8 @@ def create_interactive_pm25_trend(filename):
 
     fig.update_layout(xaxis_title='Date', yaxis_title='PM2.5')
     out_path = VIS_PATH / filename.replace(".csv", "_pm25_trend_interactive.html")
-    # Use the CDN-hosted plotly.js to keep files smaller and avoid huge embedded bundles.
-    fig.write_html(str(out_path), include_plotlyjs='cdn', full_html=True)
+    # Reference the shared local plotly.min.js in visuals/ instead of a CDN or an embedded copy.
+    fig.write_html(str(out_path), include_plotlyjs='directory', full_html=True)
     logging.info(f"Saved interactive PM2.5 trend: {out_path}")
 
 def create_interactive_top_cities():
@@ -60,7 +65,7 @@ def create_interactive_top_cities():
     if not file_path.exists():
         logging.warning(f"File not found: {file_path}. Skipping top cities chart.")
         return
-    df = pd.read_csv(file_path)
+    df = load_dataset("city_day", path=file_path)
 
     if "City" not in df.columns or "AQI" not in df.columns:
         logging.warning("Required columns not found. Skipping top cities chart.")
@@ -74,7 +79,7 @@ def create_interactive_top_cities():
     fig.update_layout(xaxis_title='City', yaxis_title='Average AQI')
 
     out_path = VIS_PATH / "top_polluted_cities_interactive.html"
-    fig.write_html(str(out_path), include_plotlyjs='cdn', full_html=True)
+    fig.write_html(str(out_path), include_plotlyjs='directory', full_html=True)
     logging.info(f"Saved interactive top cities chart: {out_path}")
 
 def create_interactive_seasonal_trends():
@@ -83,13 +88,12 @@ def create_interactive_seasonal_trends():
     if not file_path.exists():
         logging.warning(f"File not found: {file_path}. Skipping seasonal trends.")
         return
-    df = pd.read_csv(file_path)
+    df = load_dataset("city_day", path=file_path)
 
     if "Datetime" not in df.columns or "PM2.5" not in df.columns:
         logging.warning("Required columns not found. Skipping seasonal trends.")
         return
 
-    df['Datetime'] = pd.to_datetime(df['Datetime'])
     df['Month'] = df['Datetime'].dt.month
     df['Year'] = df['Datetime'].dt.year
 
@@ -101,7 +105,7 @@ def create_interactive_seasonal_trends():
     fig.update_layout(xaxis_title='Date', yaxis_title='PM2.5')
 
     out_path = VIS_PATH / "seasonal_pm25_trends_interactive.html"
-    fig.write_html(str(out_path), include_plotlyjs='cdn', full_html=True)
+    fig.write_html(str(out_path), include_plotlyjs='directory', full_html=True)
     logging.info(f"Saved interactive seasonal trends: {out_path}")
 
 def create_interactive_correlation_heatmap(filename):
@@ -110,9 +114,9 @@ def create_interactive_correlation_heatmap(filename):
     if not file_path.exists():
         logging.warning(f"File not found: {file_path}. Skipping correlation heatmap.")
         return
-    df = pd.read_csv(file_path)
+    df = load_dataset(dataset_name(filename), path=file_path)
 
-    pollutants = ['PM2.5', 'PM10', 'NO', 'NO2', 'NOx', 'NH3', 'CO', 'SO2', 'O3', 'Benzene', 'Toluene', 'Xylene']
+    pollutants = config.POLLUTANTS
     available_pollutants = [p for p in pollutants if p in df.columns]
 
     if len(available_pollutants) < 2:
@@ -131,10 +135,13 @@ def create_interactive_correlation_heatmap(filename):
     fig.update_layout(title=f'Interactive Pollutant Correlation Matrix ({filename})')
 
     out_path = VIS_PATH / filename.replace(".csv", "_correlation_interactive.html")
-    fig.write_html(str(out_path), include_plotlyjs='cdn', full_html=True)
+    fig.write_html(str(out_path), include_plotlyjs='directory', full_html=True)
     logging.info(f"Saved interactive correlation heatmap: {out_path}")
 
 def main():
+    # Ensure output directory exists
+    VIS_PATH.mkdir(parents=True, exist_ok=True)
+
     # Create interactive visualizations for city_day data
     create_interactive_pm25_trend("city_day_cleaned.csv")
     create_interactive_top_cities()
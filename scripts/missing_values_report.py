@@ -1,28 +1,38 @@
 # scripts/missing_values_report.py
+import os
+import sys
+from pathlib import Path
+
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os
-import numpy as np
 
-PROCESSED = "../data/processed/"
-OUTPUT = "../output/"
-VISUALS = "../visuals/"
-os.makedirs(OUTPUT, exist_ok=True)
-os.makedirs(VISUALS, exist_ok=True)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from sampling import label, row_weights
+from schema import load_dataset
+
+OUTPUT = config.OUTPUT_DIR
+VISUALS = config.VISUALS_DIR
 
 def main():
-    file = PROCESSED + "city_day_cleaned.csv"
+    os.makedirs(OUTPUT, exist_ok=True)
+    os.makedirs(VISUALS, exist_ok=True)
+
+    file = config.CITY_DAY_CLEANED
     print("Loading:", file)
-    df = pd.read_csv(file)
+    df = load_dataset("city_day")
 
-    # missing counts and fraction
-    miss = df.isna().sum()
-    miss_frac = (miss / len(df)).sort_values(ascending=False)
+    # missing counts and fraction, scaled to the full dataset in sample mode
+    tag = label(df)
+    weights = row_weights(df)
+    missing = df.isna().mul(weights, axis=0).sum()
+    miss = missing.round().astype(int)
+    miss_frac = (missing / weights.sum()).sort_values(ascending=False)
     miss_df = pd.concat([miss, miss_frac], axis=1)
     miss_df.columns = ["missing_count", "missing_fraction"]
-    miss_df.to_csv(OUTPUT + "missing_values_summary.csv")
-    print("Saved:", OUTPUT + "missing_values_summary.csv")
+    miss_df.to_csv(os.path.join(OUTPUT, "missing_values_summary.csv"))
+    print(f"Saved{tag}:", os.path.join(OUTPUT, "missing_values_summary.csv"))
 
     # heatmap for top 25 columns with missing values
     top_cols = miss_frac[miss_frac > 0].head(25).index.tolist()
@@ -32,10 +42,10 @@ def main():
 
     plt.figure(figsize=(12,6))
     sns.heatmap(df[top_cols].isna().transpose(), cbar=False)
-    plt.title("Missing values heatmap (rows=columns)")
+    plt.title("Missing values heatmap (rows=columns)" + tag)
     plt.xlabel("Row index (truncated)")
     plt.ylabel("Columns")
-    out = VISUALS + "missing_values_heatmap.png"
+    out = os.path.join(VISUALS, "missing_values_heatmap.png")
     plt.tight_layout()
     plt.savefig(out, dpi=200)
     plt.close()
@@ -0,0 +1,174 @@
+"""
+Hive-style partitioned copies of the processed datasets.
+
+Each dataset is split by year and City into small CSV files with the same
+columns as the original:
+
+    data/processed/partitioned/station_hour/year=2015/City=Delhi/part-0.csv
+    data/processed/partitioned/station_hour/_catalog.json
+
+The catalog lists every partition with its row count, size and first/last
+timestamp. ``schema.load_dataset(..., cities=..., start=..., end=...)`` uses
+it to open only the partitions that can match, so a one-city query reads a
+small fraction of the bytes. The entries of ``select_partitions`` can also be
+handed to separate workers, one partition each.
+
+Partitions are written by streaming the processed file in chunks, so large
+hourly files are never loaded whole. Rows are copied as text and are
+byte-for-byte the same as in the source. Re-run after the processed file
+changes; a catalog older than its source is ignored.
+
+    python scripts/aqi.py partition --datasets city_day station_hour
+"""
+
+import csv
+import json
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+from urllib.parse import quote
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import SCHEMAS, date_bounds, get_schema, load_dataset, read_header, validate_header
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CATALOG = "_catalog.json"
+PARTITION_BY = ("year", "City")
+
+
+def dataset_dir(name, root=None):
+    return os.path.join(root or config.PARTITIONED_DATA_DIR, get_schema(name).name)
+
+
+def write_partitions(name, root=None, chunksize=500_000):
+    """Split the processed file of ``name`` into year/City partitions; return the catalog."""
+    import pandas as pd
+
+    schema = get_schema(name)
+    if not schema.date_column or "City" not in schema.columns:
+        raise ValueError(f"{schema.name}: only datasets with City and {config.DATE_COLUMN} can be partitioned")
+    header = validate_header(schema, read_header(schema.path))
+    date_col = schema.date_column
+
+    target = dataset_dir(name, root)
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    partitions = {}
+
+    # Read as text so every value is written back exactly as it was
+    reader = pd.read_csv(schema.path, usecols=header, dtype=str, keep_default_na=False,
+                         chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk[header]
+        years = chunk[date_col].str[:4]
+        for (year, city), part in chunk.groupby([years, chunk["City"]], sort=False):
+            entry = partitions.get((year, city))
+            if entry is None:
+                rel = os.path.join(f"year={year}", f"City={quote(city, safe='')}", "part-0.csv")
+                os.makedirs(os.path.join(staging, os.path.dirname(rel)))
+                entry = partitions[(year, city)] = {
+                    "year": int(year), "City": city, "path": rel, "rows": 0,
+                    "start": part[date_col].min(), "end": part[date_col].max(),
+                }
+            path = os.path.join(staging, entry["path"])
+            new = not os.path.exists(path)
+            part.to_csv(path, mode="a", header=new, index=False, quoting=csv.QUOTE_MINIMAL)
+            entry["rows"] += len(part)
+            # ISO timestamps order correctly as text
+            entry["start"] = min(entry["start"], part[date_col].min())
+            entry["end"] = max(entry["end"], part[date_col].max())
+
+    entries = sorted(partitions.values(), key=lambda e: (e["year"], e["City"]))
+    for entry in entries:
+        entry["bytes"] = os.path.getsize(os.path.join(staging, entry["path"]))
+    catalog = {
+        "dataset": schema.name,
+        "source": os.path.relpath(schema.path, config.PROJECT_ROOT),
+        "source_mtime": os.path.getmtime(schema.path),
+        "partition_by": list(PARTITION_BY),
+        "columns": header,
+        "partitions": entries,
+    }
+    with open(os.path.join(staging, CATALOG), "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=1)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return catalog
+
+
+def load_catalog(name, root=None):
+    """The partition catalog of ``name``, or None if absent or older than its source."""
+    schema = get_schema(name)
+    path = os.path.join(dataset_dir(name, root), CATALOG)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        catalog = json.load(f)
+    if os.path.exists(schema.path) and os.path.getmtime(schema.path) > catalog["source_mtime"]:
+        logging.warning(f"{schema.name}: partitions are older than {schema.path}; "
+                        f"re-run `aqi.py partition` (reading the full file meanwhile)")
+        return None
+    return catalog
+
+
+def select_partitions(catalog, cities=None, start=None, end=None):
+    """Catalog entries that may hold rows for ``cities`` between ``start`` and ``end``."""
+    import pandas as pd
+
+    cities = set(cities) if cities is not None else None
+    start, end = date_bounds(catalog["dataset"], start, end)
+    selected = []
+    for entry in catalog["partitions"]:
+        if cities is not None and entry["City"] not in cities:
+            continue
+        if start is not None and pd.Timestamp(entry["end"]) < start:
+            continue
+        if end is not None and pd.Timestamp(entry["start"]) > end:
+            continue
+        selected.append(entry)
+    return selected
+
+
+def partition_path(catalog, entry, root=None):
+    return os.path.join(dataset_dir(catalog["dataset"], root), entry["path"])
+
+
+def load_partitions(name, catalog, columns=None, cities=None, start=None, end=None, root=None):
+    """Read and concatenate the partitions matching the filters (no row filtering)."""
+    import pandas as pd
+
+    selected = select_partitions(catalog, cities, start, end)
+    total = sum(e["bytes"] for e in catalog["partitions"])
+    logging.debug(f"{name}: reading {len(selected)}/{len(catalog['partitions'])} partitions "
+                  f"({sum(e['bytes'] for e in selected)}/{total} bytes)")
+    if not selected:
+        # An empty frame with the usual columns and dtypes
+        first = catalog["partitions"][:1]
+        return load_dataset(name, columns=columns, path=partition_path(catalog, first[0], root)).iloc[0:0] \
+            if first else pd.DataFrame(columns=columns or catalog["columns"])
+    frames = [load_dataset(name, columns=columns, path=partition_path(catalog, e, root)) for e in selected]
+    return pd.concat(frames, ignore_index=True)
+
+
+def main(datasets=None):
+    names = datasets or [n for n, s in SCHEMAS.items() if s.date_column and os.path.exists(s.path)]
+    for name in names:
+        schema = get_schema(name)
+        if not os.path.exists(schema.path):
+            logging.warning(f"{name}: {schema.path} not found; skipping")
+            continue
+        catalog = write_partitions(name)
+        parts = catalog["partitions"]
+        size = sum(e["bytes"] for e in parts)
+        largest = max((e["bytes"] for e in parts), default=0)
+        logging.info(f"{name}: {len(parts)} partitions, {sum(e['rows'] for e in parts)} rows, "
+                     f"{size / 1e6:.1f} MB (largest {largest / 1e3:.0f} KB) in {dataset_dir(name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,32 @@
 # scripts/pollution_hotspots.py
-import pandas as pd
-import numpy as np
 import os
+import sys
+from pathlib import Path
+
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 
-PROCESSED = "../data/processed/"
-VISUALS = "../visuals/"
-OUTPUT = "../output/"
-os.makedirs(VISUALS, exist_ok=True)
-os.makedirs(OUTPUT, exist_ok=True)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from sampling import group_estimates, label, save_intervals
+from schema import load_dataset
+
+VISUALS = config.VISUALS_DIR
+OUTPUT = config.OUTPUT_DIR
 
 def main():
-    file = PROCESSED + "city_day_cleaned.csv"
+    # scikit-learn is only needed here; import it lazily
+    from sklearn.cluster import KMeans
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import StandardScaler
+
+    os.makedirs(VISUALS, exist_ok=True)
+    os.makedirs(OUTPUT, exist_ok=True)
+
+    file = config.CITY_DAY_CLEANED
     print("Loading:", file)
-    df = pd.read_csv(file)
+    df = load_dataset("city_day")
 
     # choose pollutant columns
     poll_cols = [c for c in ["PM2.5","PM10","NO2","SO2","O3","CO"] if c in df.columns]
@@ -25,8 +35,11 @@ def main():
         poll_cols = [c for c in df.select_dtypes("number").columns if c.lower() not in ("aqi",)]
     print("Using pollutant columns:", poll_cols)
 
-    # compute city-level averages
-    city_avg = df.groupby("City")[poll_cols].mean().dropna()
+    # compute city-level averages (stratified estimates in sample mode)
+    tag = label(df)
+    est = group_estimates(df, ["City"], poll_cols)
+    city_avg = est.pivot(index="City", columns="column", values="mean")[poll_cols].dropna()
+    city_avg.columns.name = None
     if city_avg.shape[0] < 3:
         print("Not enough cities to cluster.")
         return
@@ -41,22 +54,26 @@ def main():
     labels = kmeans.fit_predict(X)
     city_avg["cluster"] = labels
 
-    city_avg.to_csv(OUTPUT + "city_pollution_clusters.csv")
-    print("Saved cluster assignment:", OUTPUT + "city_pollution_clusters.csv")
+    out = os.path.join(OUTPUT, "city_pollution_clusters.csv")
+    city_avg.to_csv(out)
+    print("Saved cluster assignment:", out)
+    ci_out = save_intervals(est, out)
+    if ci_out:
+        print(f"Saved confidence intervals{tag}:", ci_out)
 
     # Plot clusters on a 2D PCA-like scatter (use first two PCA components via SVD)
-    from sklearn.decomposition import PCA
     pca = PCA(n_components=2)
     coords = pca.fit_transform(X)
     plt.figure(figsize=(10,7))
     sns.scatterplot(x=coords[:,0], y=coords[:,1], hue=labels, palette="viridis", s=120, edgecolor="black", linewidth=0.5)
     for i, city in enumerate(city_avg.index):
         plt.text(coords[i,0]+0.02, coords[i,1]+0.02, city, fontsize=9, fontweight='bold')
-    plt.title("City Pollution Clusters (based on average pollutant levels)", fontsize=16, fontweight='bold')
+    plt.title("City Pollution Clusters (based on average pollutant levels)" + (f"\n{tag.strip()}" if tag else ""),
+              fontsize=16, fontweight='bold')
     plt.xlabel("PCA Component 1", fontsize=14)
     plt.ylabel("PCA Component 2", fontsize=14)
     plt.grid(True, linestyle='--', alpha=0.7)
-    out = VISUALS + "pollution_hotspots_clusters.png"
+    out = os.path.join(VISUALS, "pollution_hotspots_clusters.png")
     plt.tight_layout()
     plt.savefig(out, dpi=200)
     plt.close()
@@ -1,64 +1,74 @@
 # scripts/city_pollution_over_years.py
-import pandas as pd
+import os
+import sys
+from pathlib import Path
+
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os
 
-PROCESSED = "../data/processed/"
-VISUALS = "../visuals/"
-OUTPUT = "../output/"
-os.makedirs(VISUALS, exist_ok=True)
-os.makedirs(OUTPUT, exist_ok=True)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from sampling import group_estimates, label, save_intervals
+from schema import get_schema, load_dataset
 
-def detect_date_col(df):
-    for c in ["Date","date","Datetime","datetime","timestamp","Timestamp","DateTime"]:
-        if c in df.columns:
-            return c
-    return None
+VISUALS = config.VISUALS_DIR
+OUTPUT = config.OUTPUT_DIR
 
 def main():
-    file = PROCESSED + "city_day_cleaned.csv"
+    os.makedirs(VISUALS, exist_ok=True)
+    os.makedirs(OUTPUT, exist_ok=True)
+
+    file = config.CITY_DAY_CLEANED
     print("Loading:", file)
-    df = pd.read_csv(file)
-    date_col = detect_date_col(df)
-    if not date_col:
-        print("No date column. Exiting.")
-        return
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col])
-    df["year"] = df[date_col].dt.year
+    date_col = config.DATE_COLUMN
+    columns = get_schema("city_day").columns
 
     # prefer AQI if available, otherwise PM2.5
-    metric = "AQI" if "AQI" in df.columns else ("PM2.5" if "PM2.5" in df.columns else None)
+    metric = "AQI" if "AQI" in columns else ("PM2.5" if "PM2.5" in columns else None)
     if not metric:
         print("No AQI or PM2.5 column. Exiting.")
         return
 
-    # compute yearly average per city
-    city_year = df.groupby(["City","year"])[metric].mean().reset_index()
+    df = load_dataset("city_day", columns=["City", date_col, metric])
+    df["year"] = df[date_col].dt.year
+
+    # compute yearly average per city (stratified estimates in sample mode)
+    tag = label(df)
+    est = group_estimates(df, ["City", "year"], [metric])
+    city_year = est.rename(columns={"mean": metric})
 
     # pick top 6 cities by overall avg
-    top_cities = df.groupby("City")[metric].mean().nlargest(6).index.tolist()
+    top_cities = group_estimates(df, ["City"], [metric]).nlargest(6, "mean")["City"].tolist()
     print("Top cities:", top_cities)
 
     plot_df = city_year[city_year["City"].isin(top_cities)]
     plt.figure(figsize=(12,6))
-    sns.lineplot(data=plot_df, x="year", y=metric, hue="City", marker="o", palette="bright")
-    plt.title(f"{metric} trend over years — Top {len(top_cities)} cities", fontsize=16, fontweight='bold')
+    ax = sns.lineplot(data=plot_df, x="year", y=metric, hue="City", hue_order=top_cities, marker="o", palette="bright")
+    if tag:
+        # Confidence band of each sampled yearly mean, in its line's colour
+        for line, city in zip(ax.get_lines(), top_cities):
+            city_data = plot_df[plot_df["City"] == city]
+            plt.fill_between(city_data["year"], city_data["ci_low"], city_data["ci_high"],
+                             color=line.get_color(), alpha=0.15)
+    plt.title(f"{metric} trend over years — Top {len(top_cities)} cities{tag}", fontsize=16, fontweight='bold')
     plt.xlabel("Year", fontsize=14)
     plt.ylabel(metric, fontsize=14)
     plt.legend()
     plt.grid(True, linestyle='--', alpha=0.7)
     plt.tight_layout()
-    out = VISUALS + "city_pollution_over_years_top6.png"
+    out = os.path.join(VISUALS, "city_pollution_over_years_top6.png")
     plt.savefig(out, dpi=200)
     plt.close()
     print("Saved:", out)
 
     # Also save a wide CSV of city vs year
     pivot = city_year.pivot(index="City", columns="year", values=metric)
-    pivot.to_csv(OUTPUT + "city_yearly_avg.csv")
-    print("Saved:", OUTPUT + "city_yearly_avg.csv")
+    out = os.path.join(OUTPUT, "city_yearly_avg.csv")
+    pivot.to_csv(out)
+    print("Saved:", out)
+    ci_out = save_intervals(est, out)
+    if ci_out:
+        print(f"Saved confidence intervals{tag}:", ci_out)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,291 @@
+"""
+Windowed top-k rankings (per day, month, year or rolling N days) with rank
+change tracking.
+
+Daily readings are scattered once into a groups x days grid and turned into
+cumulative sums and counts along the time axis. The mean of any window is
+then two subtractions, (S[end] - S[start]) / (C[end] - C[start]), for every
+group at once. For each window the top k groups are selected with
+``np.argpartition`` (O(groups)) and only those k are sorted.
+
+The cumulative state is saved next to the history tables in
+``output/rankings/<dataset>/``. New days can
+be appended without recomputing the existing ones, and only windows that
+reach past the previous end are re-ranked:
+
+    python scripts/aqi.py rankings --periods day month year --k 10
+    python scripts/aqi.py rankings --extend data/raw/new_days.csv
+"""
+
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RANKINGS_DIR = os.path.join(config.OUTPUT_DIR, "rankings")
+PERIODS = ("day", "month", "year")
+HISTORY_COLUMNS = ["window_start", "window_end", "rank", "group", "mean",
+                   "previous_rank", "rank_change", "status"]
+
+
+@dataclass
+class RankingState:
+    """Cumulative sums over a groups x days grid, starting at ``start``."""
+    groups: np.ndarray
+    start: np.datetime64
+    sums: np.ndarray    # shape (groups, days + 1), sums[:, 0] == 0
+    counts: np.ndarray  # same shape, number of readings
+
+    @property
+    def days(self):
+        return self.sums.shape[1] - 1
+
+    @property
+    def end(self):
+        return self.start + np.timedelta64(self.days, "D")
+
+
+def _daily_grid(codes, days, n_groups, n_days, values):
+    # Sum and count readings per (group, day); several readings on one day
+    # (e.g. two stations of a city) are pooled.
+    valid = ~np.isnan(values)
+    flat = codes[valid] * n_days + days[valid]
+    sums = np.bincount(flat, weights=values[valid], minlength=n_groups * n_days)
+    counts = np.bincount(flat, minlength=n_groups * n_days).astype(np.float64)
+    return sums.reshape(n_groups, n_days), counts.reshape(n_groups, n_days)
+
+
+def build_state(df, key, metric="AQI", date_col=config.DATE_COLUMN):
+    import pandas as pd
+
+    # Hash-based factorize is much faster than np.unique on object strings
+    codes, labels = pd.factorize(df[key], sort=True)
+    labels = np.asarray(labels, dtype=object)
+    dates = df[date_col].to_numpy("datetime64[D]")
+    start = dates.min()
+    days = (dates - start).astype(np.int64)
+    n_days = int(days.max()) + 1
+    sums, counts = _daily_grid(codes, days, len(labels), n_days, df[metric].to_numpy(np.float64))
+    zeros = np.zeros((len(labels), 1))
+    return RankingState(labels, start,
+                        np.hstack([zeros, np.cumsum(sums, axis=1)]),
+                        np.hstack([zeros, np.cumsum(counts, axis=1)]))
+
+
+def extend_state(state, df, key, metric="AQI", date_col=config.DATE_COLUMN):
+    """Append readings for days after ``state.end``; returns a new state."""
+    dates = df[date_col].to_numpy("datetime64[D]")
+    new = dates >= state.end
+    if (~new).any():
+        logging.warning(f"Ignoring {int((~new).sum())} readings before {state.end} (already ranked)")
+    if not new.any():
+        return state
+    df = df[new]
+    dates = dates[new]
+
+    labels = np.union1d(state.groups, df[key].to_numpy())
+    sums = _reindex_rows(state.sums, state.groups, labels)
+    counts = _reindex_rows(state.counts, state.groups, labels)
+
+    codes = np.searchsorted(labels, df[key].to_numpy())
+    days = (dates - state.end).astype(np.int64)
+    n_days = int(days.max()) + 1
+    day_sums, day_counts = _daily_grid(codes, days, len(labels), n_days, df[metric].to_numpy(np.float64))
+
+    # Continue each cumulative row from its last value
+    sums = np.hstack([sums, sums[:, -1:] + np.cumsum(day_sums, axis=1)])
+    counts = np.hstack([counts, counts[:, -1:] + np.cumsum(day_counts, axis=1)])
+    return RankingState(labels, state.start, sums, counts)
+
+
+def _reindex_rows(array, old_labels, new_labels):
+    out = np.zeros((len(new_labels), array.shape[1]))
+    out[np.searchsorted(new_labels, old_labels)] = array
+    return out
+
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, groups=state.groups.astype(str), start=np.array(state.start),
+                        sums=state.sums, counts=state.counts)
+
+
+def load_state(path):
+    with np.load(path) as data:
+        return RankingState(data["groups"], data["start"][()], data["sums"], data["counts"])
+
+
+def window_edges(state, period):
+    """Day offsets [e0, e1, ..., eN] of calendar windows covering the grid."""
+    if period == "day":
+        return np.arange(state.days + 1)
+    unit = {"month": "M", "year": "Y"}[period]
+    dates = state.start + np.arange(state.days + 1).astype("timedelta64[D]")
+    buckets = dates.astype(f"datetime64[{unit}]")
+    inner = np.flatnonzero(buckets[1:-1] != buckets[:-2]) + 1
+    return np.concatenate([[0], inner, [state.days]])
+
+
+def window_means(state, starts, ends):
+    """Mean of every group over each window; shape (windows, groups)."""
+    sums = state.sums[:, ends] - state.sums[:, starts]
+    counts = state.counts[:, ends] - state.counts[:, starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan).T
+
+
+def top_k(means, k):
+    """Indices and values of the k largest means per row, best first.
+
+    Rows with fewer than k valid groups are padded with index -1.
+    """
+    n_windows, n_groups = means.shape
+    k = min(k, n_groups)
+    scores = np.where(np.isnan(means), -np.inf, means)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    idx = np.take_along_axis(part, order, axis=1)
+    vals = np.take_along_axis(part_scores, order, axis=1)
+    idx[np.isneginf(vals)] = -1
+    return idx, np.where(np.isneginf(vals), np.nan, vals)
+
+
+def rank_windows(state, starts, ends, k, previous=None):
+    """
+    Rank the given windows and return history rows with rank changes.
+
+    ``previous`` is the top-k index list of the window before ``starts[0]``
+    (used when extending an existing history).
+    """
+    idx, vals = top_k(window_means(state, starts, ends), k)
+    day = np.timedelta64(1, "D")
+    rows = []
+    prev_rank = {g: r for r, g in enumerate(previous, 1) if g >= 0} if previous is not None else None
+    for w in range(len(starts)):
+        window_start = state.start + int(starts[w]) * day
+        window_end = state.start + (int(ends[w]) - 1) * day
+        current = {g: r for r, g in enumerate(idx[w], 1) if g >= 0}
+        for rank, g in enumerate(idx[w], 1):
+            if g < 0:
+                continue
+            before = prev_rank.get(g) if prev_rank is not None else None
+            if prev_rank is None:
+                status, change = "", None
+            elif before is None:
+                status, change = "entered", None
+            else:
+                change = before - rank
+                status = "up" if change > 0 else ("down" if change < 0 else "same")
+            rows.append((window_start, window_end, rank, state.groups[g], vals[w, rank - 1],
+                         before, change, status))
+        if prev_rank is not None:
+            for g, before in prev_rank.items():
+                if g not in current:
+                    rows.append((window_start, window_end, None, state.groups[g],
+                                 np.nan, before, None, "exited"))
+        prev_rank = current
+    return rows, idx[-1] if len(idx) else previous
+
+
+def rolling_bounds(state, n_days):
+    ends = np.arange(n_days, state.days + 1)
+    return ends - n_days, ends
+
+
+def rankings(state, period, k=10, since_day=None, previous_history=None):
+    """
+    History table for one period ("day", "month", "year" or an int N for a
+    trailing N-day window). With ``since_day``, only windows ending after
+    that day offset are ranked and appended to ``previous_history``.
+    """
+    import pandas as pd
+
+    if isinstance(period, int):
+        starts, ends = rolling_bounds(state, period)
+    else:
+        edges = window_edges(state, period)
+        starts, ends = edges[:-1], edges[1:]
+
+    previous = None
+    if since_day is not None and previous_history is not None and len(previous_history):
+        first = np.searchsorted(ends, since_day, side="right")
+        # Drop windows that the new days changed (a partial last month/year)
+        # and re-rank from there, seeding deltas with the last kept window.
+        if first > 0:
+            keep_until = state.start + int(ends[first - 1] - 1) * np.timedelta64(1, "D")
+            previous_history = previous_history[previous_history["window_end"] <= keep_until]
+            last = previous_history[previous_history["window_end"] == keep_until]
+            last = last[last["status"] != "exited"].sort_values("rank")
+            lookup = {g: i for i, g in enumerate(state.groups)}
+            previous = np.array([lookup[g] for g in last["group"]]) if len(last) else None
+        else:
+            previous_history = previous_history.iloc[0:0]
+        starts, ends = starts[first:], ends[first:]
+
+    rows, _ = rank_windows(state, starts, ends, k, previous)
+    history = pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+    history["rank"] = history["rank"].astype("Int64")
+    history["previous_rank"] = history["previous_rank"].astype("Int64")
+    history["rank_change"] = history["rank_change"].astype("Int64")
+    if previous_history is not None and since_day is not None:
+        history = pd.concat([previous_history, history], ignore_index=True)
+    return history
+
+
+def _period_name(period):
+    return f"rolling{period}d" if isinstance(period, int) else period
+
+
+def main(dataset="city_day", metric="AQI", k=10, periods=PERIODS, rolling=None, extend=None):
+    import pandas as pd
+
+    schema = get_schema(dataset)
+    key = schema.keys[-1]
+    out_dir = os.path.join(RANKINGS_DIR, dataset)
+    os.makedirs(out_dir, exist_ok=True)
+    state_file = os.path.join(out_dir, f"state_{metric}.npz")
+    periods = list(periods) + ([rolling] if rolling else [])
+
+    since_day = None
+    if extend:
+        if not os.path.exists(state_file):
+            logging.error(f"No saved state at {state_file}; run without --extend first.")
+            return 1
+        state = load_state(state_file)
+        since_day = state.days
+        new = load_dataset(dataset, columns=[key, schema.date_column, metric], path=extend)
+        state = extend_state(state, new, key, metric)
+        logging.info(f"Extended rankings by {state.days - since_day} day(s) from {extend}")
+    else:
+        # Each day is ranked against the day before: full data even in sample mode
+        df = load_dataset(dataset, columns=[key, schema.date_column, metric], sample=0)
+        state = build_state(df, key, metric)
+    save_state(state, state_file)
+
+    for period in periods:
+        path = os.path.join(out_dir, f"top{k}_{metric}_{_period_name(period)}.csv")
+        previous = None
+        if since_day is not None and os.path.exists(path):
+            previous = pd.read_csv(path, parse_dates=["window_start", "window_end"],
+                                   dtype={key: str, "status": str})
+            previous = previous.rename(columns={key: "group", metric: "mean"})
+            previous["status"] = previous["status"].fillna("")
+        history = rankings(state, period, k, since_day if previous is not None else None, previous)
+        history = history.rename(columns={"group": key, "mean": metric})
+        history.to_csv(path, index=False, date_format=config.DATE_FORMAT_DAILY)
+        windows = history["window_start"].nunique()
+        logging.info(f"Saved top-{k} {_period_name(period)} rankings ({windows} windows): {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Reconcile city-level data with the stations it is built from.
+
+Two checks, for daily (city_day vs station_day) or hourly
+(city_hour vs station_hour) data:
+
+1. Station readings are aggregated to (City, Datetime) in one pass. City
+   category codes and the integer time step are packed into a single int64
+   key, hashed once with ``pd.factorize`` and reduced with ``np.bincount``.
+   The result is joined to the city table by binary search over the sorted
+   keys. Any pollutant where the city value and the station mean differ by
+   more than ``abs_tol + rel_tol * |city value|`` is reported.
+2. Rows present in the raw file but missing from the processed one are listed
+   with the most likely reason, so rows dropped by cleaning are on record.
+
+Both tables are loaded with categorical text columns and float measures, so
+neither is held as an object-dtype frame.
+
+    python scripts/aqi.py reconcile --resolution hour --rel-tol 0.05
+"""
+
+import logging
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+RECONCILE_DIR = os.path.join(config.OUTPUT_DIR, "reconciliation")
+PAIRS = {"day": ("city_day", "station_day"), "hour": ("city_hour", "station_hour")}
+
+
+def _steps(df, hourly, date_col=config.DATE_COLUMN):
+    return df[date_col].to_numpy("datetime64[h]" if hourly else "datetime64[D]").astype(np.int64)
+
+
+def aggregate_stations(df, measures, hourly, origin, span, key="City"):
+    """
+    Mean of each measure over the stations of a city at each time step.
+
+    Returns (sorted composite keys, means of shape (groups, measures),
+    station counts per group). A composite key is ``code * span + step - origin``.
+    """
+    import pandas as pd
+
+    composite = df[key].cat.codes.to_numpy().astype(np.int64) * span + (_steps(df, hourly) - origin)
+    codes, keys = pd.factorize(composite, sort=True)
+    n = len(keys)
+    stations = np.bincount(codes, minlength=n)
+    means = np.empty((n, len(measures)))
+    for j, c in enumerate(measures):
+        values = df[c].to_numpy(np.float64)
+        valid = ~np.isnan(values)
+        sums = np.bincount(codes[valid], weights=values[valid], minlength=n)
+        counts = np.bincount(codes[valid], minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[:, j] = np.where(counts > 0, sums / counts, np.nan)
+    return keys, means, stations
+
+
+def sorted_join(left_keys, right_keys):
+    """Positions in sorted ``right_keys`` matching each left key, or -1."""
+    if not len(right_keys):
+        return np.full(len(left_keys), -1)
+    pos = np.searchsorted(right_keys, left_keys)
+    pos[pos == len(right_keys)] = 0
+    return np.where(right_keys[pos] == left_keys, pos, -1)
+
+
+def reconcile(city_df, station_df, measures, hourly, abs_tol=0.5, rel_tol=0.01, key="City"):
+    """Compare city values with station aggregates; return (summary, details, unmatched)."""
+    import pandas as pd
+
+    # Shared categories so both sides use the same City codes
+    categories = station_df[key].cat.categories.union(city_df[key].cat.categories)
+    station_df = station_df.assign(**{key: station_df[key].cat.set_categories(categories)})
+    city_df = city_df.assign(**{key: city_df[key].cat.set_categories(categories)})
+
+    city_steps = _steps(city_df, hourly)
+    station_steps = _steps(station_df, hourly)
+    origin = min(city_steps.min(), station_steps.min())
+    span = max(city_steps.max(), station_steps.max()) - origin + 1
+
+    agg_keys, agg_means, n_stations = aggregate_stations(station_df, measures, hourly, origin, span, key)
+    city_keys = city_df[key].cat.codes.to_numpy().astype(np.int64) * span + (city_steps - origin)
+    match = sorted_join(city_keys, agg_keys)
+    matched = match >= 0
+
+    unit = "h" if hourly else "D"
+
+    def decode(keys):
+        cities = np.asarray(categories)[keys // span]
+        times = (keys % span + origin).astype(f"datetime64[{unit}]")
+        return cities, times
+
+    city_values = city_df[measures].to_numpy(np.float64)[matched]
+    station_values = agg_means[match[matched]]
+    diff = station_values - city_values
+    tolerance = abs_tol + rel_tol * np.abs(city_values)
+    flagged = np.abs(diff) > tolerance  # NaN on either side never flags
+
+    summary_rows, details = [], []
+    cities, times = decode(city_keys[matched])
+    counts = n_stations[match[matched]]
+    for j, measure in enumerate(measures):
+        both = ~np.isnan(diff[:, j])
+        bad = np.flatnonzero(flagged[:, j])
+        abs_diff = np.abs(diff[both, j])
+        worst = bad[np.argmax(np.abs(diff[bad, j]))] if len(bad) else None
+        summary_rows.append({
+            "pollutant": measure,
+            "compared": int(both.sum()),
+            "discrepancies": len(bad),
+            "discrepancy_rate": len(bad) / both.sum() if both.any() else np.nan,
+            "mean_abs_diff": abs_diff.mean() if len(abs_diff) else np.nan,
+            "max_abs_diff": abs_diff.max() if len(abs_diff) else np.nan,
+            f"worst_{key}": cities[worst] if worst is not None else None,
+            "worst_Datetime": times[worst] if worst is not None else None,
+        })
+        details.append(pd.DataFrame({
+            key: cities[bad], config.DATE_COLUMN: times[bad], "pollutant": measure,
+            "city_value": city_values[bad, j], "station_mean": station_values[bad, j],
+            "difference": diff[bad, j], "stations": counts[bad],
+        }))
+
+    # Keys found on only one side
+    only_city = city_keys[~matched]
+    only_station = np.setdiff1d(agg_keys, city_keys[matched], assume_unique=False)
+    unmatched = []
+    for side, keys in (("city only", only_city), ("stations only", only_station)):
+        c, t = decode(keys)
+        unmatched.append(pd.DataFrame({key: c, config.DATE_COLUMN: t, "side": side}))
+
+    details = pd.concat(details, ignore_index=True)
+    details = details.reindex(details["difference"].abs().sort_values(ascending=False).index)
+    return pd.DataFrame(summary_rows), details, pd.concat(unmatched, ignore_index=True)
+
+
+def dropped_rows(name):
+    """
+    Rows of the raw file that did not make it into the processed file.
+
+    Rows are matched on (City, Datetime[, Station]); the n-th raw row with a
+    key counts as kept if the processed file has at least n rows with it, so
+    removed duplicates are listed too. Returns None if either file is absent.
+    """
+    schema = get_schema(name)
+    if not (Path(schema.raw_path).exists() and Path(schema.path).exists()):
+        return None
+    keys = [c for c in schema.columns if c in schema.keys or c == schema.date_column]
+    raw = load_dataset(name, raw=True, categorical=True)
+    processed = load_dataset(name, columns=keys, categorical=True, sample=0)
+
+    occurrence = raw.groupby(keys, observed=True, dropna=False, sort=False).cumcount().to_numpy()
+    kept = processed.groupby(keys, observed=True, dropna=False, sort=False).size().rename("kept")
+    kept = raw[keys].join(kept, on=keys)["kept"].fillna(0).to_numpy()
+    dropped = raw[occurrence >= kept].copy()
+
+    reasons = np.full(len(dropped), "not in processed file", dtype=object)
+    if "AQI" in dropped:
+        aqi = dropped["AQI"].to_numpy()
+        reasons[aqi <= 0] = "AQI is zero or negative"
+        reasons[np.isnan(aqi)] = "AQI missing"
+    reasons[occurrence[occurrence >= kept] > 0] = "duplicate key"
+    reasons[dropped[keys].isna().any(axis=1).to_numpy()] = "missing key"
+    dropped.insert(0, "reason", reasons)
+    return dropped
+
+
+def main(resolution="day", abs_tol=0.5, rel_tol=0.01, max_details=10000):
+    city_name, station_name = PAIRS[resolution]
+    city_schema, station_schema = get_schema(city_name), get_schema(station_name)
+    os.makedirs(RECONCILE_DIR, exist_ok=True)
+
+    for name in (city_name, station_name):
+        dropped = dropped_rows(name)
+        if dropped is None:
+            continue
+        out = os.path.join(RECONCILE_DIR, f"{name}_dropped_rows.csv")
+        dropped.to_csv(out, index=False, date_format=city_schema.date_format)
+        reasons = dropped["reason"].value_counts().to_dict()
+        logging.info(f"{name}: {len(dropped)} raw rows missing after cleaning {reasons}: {out}")
+
+    missing = [s.path for s in (city_schema, station_schema) if not Path(s.path).exists()]
+    if missing:
+        logging.warning(f"Cannot reconcile {city_name} with {station_name}; file(s) not found: {missing}")
+        return 1
+
+    measures = [m for m in city_schema.measures if m in station_schema.measures]
+    # An audit compares every row, so sample mode does not apply
+    city_df = load_dataset(city_name, columns=["City", city_schema.date_column] + measures,
+                           categorical=True, sample=0)
+    station_df = load_dataset(station_name, columns=["City", station_schema.date_column] + measures,
+                              categorical=True, sample=0)
+    summary, details, unmatched = reconcile(city_df, station_df, measures, city_schema.hourly,
+                                            abs_tol, rel_tol)
+
+    prefix = os.path.join(RECONCILE_DIR, f"{city_name}_vs_{station_name}")
+    summary.to_csv(prefix + "_summary.csv", index=False, date_format=city_schema.date_format)
+    details.head(max_details).to_csv(prefix + "_discrepancies.csv", index=False, date_format=city_schema.date_format)
+    unmatched.to_csv(prefix + "_unmatched.csv", index=False, date_format=city_schema.date_format)
+
+    print(f"\n{city_name} vs {station_name} (tolerance {abs_tol} + {rel_tol:.1%} of city value):")
+    print(summary[["pollutant", "compared", "discrepancies", "discrepancy_rate", "max_abs_diff"]]
+          .to_string(index=False))
+    print(f"Rows only in {city_name}: {(unmatched['side'] == 'city only').sum()}, "
+          f"only in {station_name}: {(unmatched['side'] == 'stations only').sum()}")
+    logging.info(f"Saved reconciliation reports: {prefix}_*.csv "
+                 f"({min(len(details), max_details)} of {len(details)} discrepancies written)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,47 @@
 #Master script to run all analysis and visualization scripts in sequence.
 import os
 import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.realpath(__file__))
 
 scripts = [
     "clean_data.py",
-    "analyze_data.py",
-    "analyze_data_enhanced.py",
-    "analyze_stations.py",
-    "seasonal_trends.py",
-    "city_comparison_dashboard.py",
-    "city_pollution_over_years.py",
+    "air_quality_analysis.py",
+    "station_analysis.py",
+    "seasonal_analysis.py",
+    "city_comparison.py",
+    "pollution_trends.py",
     "pollution_hotspots.py",
-    "top_polluted_cities.py",
+    "city_ranking.py",
     "missing_values_report.py",
     "interactive_visualizations.py",
     "generate_summary.py",
     "run_example.py"
 ]
 
-print("🚀 Running All Scripts...\n")
 
-for script in scripts:
-    print(f"▶ Running {script}...")
-    path = os.path.join(os.getcwd(), script)
-    subprocess.run(["python", path])
-    print(f"✔ Done: {script}\n")
+def main():
+    print("🚀 Running All Scripts...\n")
+
+    failed = []
+    for script in scripts:
+        print(f"▶ Running {script}...")
+        path = os.path.join(SCRIPTS_DIR, script)
+        # Each script runs in its own interpreter so one failure does not stop the rest
+        result = subprocess.run([sys.executable, path])
+        if result.returncode != 0:
+            failed.append(script)
+            print(f"✖ Failed: {script}\n")
+        else:
+            print(f"✔ Done: {script}\n")
+
+    if failed:
+        print(f"\n⚠ {len(failed)} script(s) failed: {', '.join(failed)}")
+        return 1
+    print("\n🎉 ALL SCRIPTS COMPLETED SUCCESSFULLY! 🎉")
+    return 0
+
 
-print("\n🎉 ALL SCRIPTS COMPLETED SUCCESSFULLY! 🎉")
+if __name__ == "__main__":
+    sys.exit(main())
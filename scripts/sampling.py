@@ -0,0 +1,256 @@
+"""
+Stratified sampling for fast exploratory runs, with error estimates.
+
+A sample keeps the same fraction of rows from every City x year x month
+stratum, and at least two rows per stratum so each stratum has a
+variance. Rows are picked by a seeded random permutation within each
+stratum, so a given file, fraction and seed always yield the same
+sample. The sample and the size of each stratum are cached in
+data/processed/samples/. A sampled run therefore reads the full file
+only once.
+
+``schema.load_dataset`` samples when ``sample=`` is given, or for every
+processed dataset when sample mode is on (``aqi --sample 0.05 <command>``
+or AQI_SAMPLE=0.05). In sample mode every script writes to output/sample/
+and visuals/sample/ so full-data results are never overwritten. The
+sampled frame records its design in ``df.attrs["sample"]``.
+
+Estimates treat each group (a city, a season, a year...) as a domain of
+the stratified design. Each stratum is weighted by population / sampled
+rows. Standard errors use the linearised domain-mean variance with the
+finite population correction, so a full dataset (or 100% strata) gets
+zero-width intervals:
+
+    from sampling import group_estimates, rank_with_ci
+    df = load_dataset("city_day", sample=0.05)
+    est = group_estimates(df, ["City"], ["PM2.5"])
+    ranking = rank_with_ci(est[est["column"] == "PM2.5"])
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+
+MIN_PER_STRATUM = 2
+STRATA = ("City", "year", "month")
+
+
+def sample_info(df):
+    """Sampling design of ``df`` (dict), or None for a full dataset."""
+    return df.attrs.get("sample")
+
+
+def label(df):
+    """Suffix for titles and reports of results computed from ``df``."""
+    info = sample_info(df)
+    if not info:
+        return ""
+    return f" [sampled: {info['fraction']:.0%} per City × year × month, seed {info['seed']}]"
+
+
+def _strata_keys(df, date_col):
+    if "City" not in df or date_col not in df:
+        raise ValueError(f"Sample strata need the City and {date_col} columns")
+    months = df[date_col].to_numpy("datetime64[M]").astype(np.int64)
+    return df["City"].astype(str).to_numpy(object), months // 12 + 1970, months % 12 + 1
+
+
+def _stratum_codes(df, date_col, strata=None):
+    """Stratum code per row and the (City, year, month) label of each code."""
+    import pandas as pd
+
+    city, year, month = _strata_keys(df, date_col)
+    index = pd.MultiIndex.from_arrays([city, year, month])
+    if strata is None:
+        codes, labels = pd.factorize(index, sort=True)
+        return codes, list(labels)
+    if not len(strata):
+        return np.full(len(index), -1, dtype=np.int64), strata
+    known = pd.MultiIndex.from_tuples([tuple(s) for s in strata])
+    return known.get_indexer(index).astype(np.int64), strata
+
+
+def stratified_sample(df, fraction, seed=0, date_col=config.DATE_COLUMN):
+    """
+    Draw ``fraction`` of the rows of every City x year x month stratum.
+
+    Returns the sample, row order kept, with its design in
+    ``attrs["sample"]``.
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"Sample fraction must be in (0, 1], got {fraction}")
+    codes, strata = _stratum_codes(df, date_col)
+    population = np.bincount(codes, minlength=len(strata))
+    target = np.minimum(population, np.maximum(MIN_PER_STRATUM, np.ceil(fraction * population))).astype(np.int64)
+
+    # Rank rows within their stratum by a seeded random key
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(df)), codes))
+    starts = np.concatenate([[0], np.cumsum(population)[:-1]])
+    rank = np.empty(len(df), dtype=np.int64)
+    rank[order] = np.arange(len(df)) - starts[codes[order]]
+    keep = rank < target[codes]
+
+    sample = df[keep].reset_index(drop=True)
+    sample.attrs["sample"] = _design(fraction, seed, strata, population, target)
+    return sample
+
+
+def _design(fraction, seed, strata, population, sampled):
+    return {
+        "fraction": float(fraction),
+        "seed": int(seed),
+        "strata": [[str(c), int(y), int(m)] for c, y, m in strata],
+        "population": [int(n) for n in population],
+        "sampled": [int(n) for n in sampled],
+    }
+
+
+def cache_paths(name, fraction, seed):
+    stem = os.path.join(config.SAMPLE_DATA_DIR, f"{name}_{fraction:g}_seed{seed}")
+    return stem + ".csv", stem + "_design.json"
+
+
+def load_sample(name, fraction, seed=None, columns=None):
+    """
+    Stratified sample of a processed dataset, built once per fraction and
+    seed and then read from the cache (rebuilt when the data is newer).
+    """
+    from schema import get_schema, load_dataset
+
+    schema = get_schema(name)
+    seed = config.SAMPLE_SEED if seed is None else seed
+    sample_path, design_path = cache_paths(schema.name, fraction, seed)
+    fresh = os.path.exists(sample_path) and os.path.exists(design_path) \
+        and os.path.getmtime(sample_path) >= os.path.getmtime(schema.path)
+    if not fresh:
+        sample = stratified_sample(load_dataset(name, sample=0), fraction, seed, schema.date_column)
+        os.makedirs(config.SAMPLE_DATA_DIR, exist_ok=True)
+        sample.to_csv(sample_path + ".tmp", index=False, date_format=schema.date_format)
+        with open(design_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(sample.attrs["sample"], f)
+        os.replace(sample_path + ".tmp", sample_path)
+        os.replace(design_path + ".tmp", design_path)
+
+    df = load_dataset(name, columns=columns, path=sample_path)
+    with open(design_path, encoding="utf-8") as f:
+        df.attrs["sample"] = json.load(f)
+    return df
+
+
+def _weights(df, date_col):
+    """Per-row stratum code, weight, population and sampled size of each stratum."""
+    info = sample_info(df)
+    if not info:
+        codes, strata = _stratum_codes(df, date_col)
+        sizes = np.bincount(codes, minlength=len(strata)).astype(np.float64)
+        return codes, np.ones(len(df)), sizes, sizes
+    codes, _ = _stratum_codes(df, date_col, info["strata"])
+    population = np.asarray(info["population"], dtype=np.float64)
+    sampled = np.asarray(info["sampled"], dtype=np.float64)
+    if (codes < 0).any():
+        raise ValueError("Rows outside the sample design; estimate from the frame load_dataset returned")
+    return codes, (population / sampled)[codes], population, sampled
+
+
+def group_estimates(df, by, columns, level=config.SAMPLE_CONFIDENCE, date_col=config.DATE_COLUMN):
+    """
+    Estimated mean of each of ``columns`` per group of ``by``, with its
+    standard error and a normal ``level`` confidence interval.
+
+    ``rows_est`` scales the group's row count to the full dataset. On
+    unsampled data the means are exact and the intervals have zero width.
+    """
+    import pandas as pd
+
+    by = [by] if isinstance(by, str) else list(by)
+    strata, weights, population, sampled = _weights(df, date_col)
+    groups, labels = pd.factorize(pd.MultiIndex.from_frame(df[by]), sort=True)
+    n_groups, n_strata = len(labels), len(population)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    # Finite population correction and expansion factor per stratum
+    factor = np.where(sampled > 1, population ** 2 * (1 - sampled / population) / np.maximum(sampled, 1), 0.0)
+    cell = strata.astype(np.int64) * n_groups + groups
+
+    rows = []
+    for column in columns:
+        y = df[column].to_numpy(np.float64)
+        valid = ~np.isnan(y)
+        g, w, yv = groups[valid], weights[valid], y[valid]
+        size = np.bincount(g, weights=w, minlength=n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.bincount(g, weights=w * yv, minlength=n_groups) / size
+            # Linearised domain mean: d = (y - mean) / size inside the
+            # domain, 0 elsewhere; its variance per stratum over all rows
+            # sampled from that stratum
+            d = (yv - mean[g]) / size[g]
+            s1 = np.bincount(cell[valid], weights=d, minlength=n_strata * n_groups).reshape(n_strata, n_groups)
+            s2 = np.bincount(cell[valid], weights=d * d, minlength=n_strata * n_groups).reshape(n_strata, n_groups)
+            n_h = sampled[:, None]
+            var_h = np.where(n_h > 1, (s2 - s1 * s1 / n_h) / (n_h - 1), 0.0)
+            se = np.sqrt(np.maximum((factor[:, None] * var_h).sum(axis=0), 0.0))
+        counts = np.bincount(g, minlength=n_groups)
+        for i, key in enumerate(labels):
+            key = key if isinstance(key, tuple) else (key,)
+            rows.append({**dict(zip(by, key)), "column": column, "n": int(counts[i]),
+                         "rows_est": size[i], "mean": mean[i], "se": se[i],
+                         "ci_low": mean[i] - z * se[i], "ci_high": mean[i] + z * se[i]})
+    est = pd.DataFrame(rows)
+    est.attrs["sample"] = sample_info(df)
+    est.attrs["level"] = level
+    return est
+
+
+def row_weights(df, date_col=config.DATE_COLUMN):
+    """Full-dataset rows each row of ``df`` stands for (1 when not sampled)."""
+    import pandas as pd
+
+    _, weights, _, _ = _weights(df, date_col)
+    return pd.Series(weights, index=df.index)
+
+
+def estimated_counts(df, by, date_col=config.DATE_COLUMN):
+    """Row counts per group of ``by``, scaled to the full dataset."""
+    by = [by] if isinstance(by, str) else list(by)
+    return row_weights(df, date_col).groupby([df[c] for c in by]).sum().rename("rows_est")
+
+
+def save_intervals(est, path):
+    """
+    Next to a table of sampled means saved at ``path``, write the estimates
+    it came from (with their CIs) to <name>_ci.csv. Returns that path, or
+    None for full-data estimates, which need no intervals.
+    """
+    if not est.attrs.get("sample"):
+        return None
+    out = os.path.splitext(path)[0] + "_ci.csv"
+    est.to_csv(out, index=False)
+    return out
+
+
+def rank_with_ci(est, ascending=False):
+    """
+    Rank the groups of one column's estimates by mean, with the range of
+    ranks consistent with the confidence intervals: ``rank_best`` counts
+    only groups certainly ahead, ``rank_worst`` every group possibly ahead.
+    """
+    est = est.sort_values("mean", ascending=ascending).reset_index(drop=True)
+    lo, hi = est["ci_low"].to_numpy(), est["ci_high"].to_numpy()
+    if ascending:
+        ahead_surely = hi[None, :] < lo[:, None]
+        ahead_maybe = lo[None, :] < hi[:, None]
+    else:
+        ahead_surely = lo[None, :] > hi[:, None]
+        ahead_maybe = hi[None, :] > lo[:, None]
+    np.fill_diagonal(ahead_maybe, False)
+    est.insert(0, "rank", np.arange(1, len(est) + 1))
+    est["rank_best"] = 1 + ahead_surely.sum(axis=1)
+    est["rank_worst"] = 1 + ahead_maybe.sum(axis=1)
+    return est
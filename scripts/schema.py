@@ -0,0 +1,260 @@
+"""
+Schema registry for the air quality datasets.
+
+Each dataset declares its columns, their dtypes and the exact format of its
+timestamp column. ``load_dataset`` checks a file's header against the schema
+and hands ``read_csv`` an explicit dtype map and date format, so parsing is
+deterministic and pandas never has to guess.
+
+    from schema import load_dataset
+    df = load_dataset("city_day", columns=["City", "Datetime", "PM2.5"])
+"""
+
+import csv
+import logging
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaError(ValueError):
+    """Raised when a file does not match its declared schema."""
+
+
+@dataclass(frozen=True)
+class Schema:
+    name: str
+    path: str
+    raw_path: str
+    columns: tuple
+    dtypes: dict = field(hash=False)
+    date_format: str = None
+
+    @property
+    def date_column(self):
+        return config.DATE_COLUMN if self.date_format else None
+
+    @property
+    def keys(self):
+        # Identifier columns a series is grouped by (City, or City + Station)
+        return tuple(c for c in ("City", "Station") if c in self.columns)
+
+    @property
+    def measures(self):
+        return tuple(c for c in self.columns if self.dtypes.get(c) == "float64")
+
+    @property
+    def hourly(self):
+        return self.date_format == config.DATE_FORMAT_HOURLY
+
+
+MEASURES = config.POLLUTANTS + ["AQI"]
+TEXT = "str"
+
+
+def _schema(name, path, raw_path, keys, date_format=None, measures=True):
+    columns = list(keys[:1])
+    if date_format:
+        columns.append(config.DATE_COLUMN)
+    columns += list(keys[1:])
+    if measures:
+        columns += MEASURES + ["AQI_Bucket"]
+    dtypes = {c: "float64" if c in MEASURES else TEXT
+              for c in columns if c != config.DATE_COLUMN}
+    return Schema(name, path, raw_path, tuple(columns), dtypes, date_format)
+
+
+SCHEMAS = {
+    "city_day": _schema("city_day", config.CITY_DAY_CLEANED, config.CITY_DAY_RAW,
+                        ["City"], config.DATE_FORMAT_DAILY),
+    "city_hour": _schema("city_hour", config.CITY_HOUR_CLEANED, config.CITY_HOUR_RAW,
+                         ["City"], config.DATE_FORMAT_HOURLY),
+    "station_day": _schema("station_day", config.STATION_DAY_CLEANED, config.STATION_DAY_RAW,
+                           ["City", "Station"], config.DATE_FORMAT_DAILY),
+    "station_hour": _schema("station_hour", config.STATION_HOUR_CLEANED, config.STATION_HOUR_RAW,
+                            ["City", "Station"], config.DATE_FORMAT_HOURLY),
+    "stations": _schema("stations", config.STATIONS_CLEANED, config.STATIONS_RAW,
+                        ["City", "Station"], measures=False),
+}
+
+
+def get_schema(name):
+    if isinstance(name, Schema):
+        return name
+    try:
+        return SCHEMAS[name]
+    except KeyError:
+        raise KeyError(f"Unknown dataset {name!r}; expected one of {sorted(SCHEMAS)}") from None
+
+
+def read_header(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def validate_header(name, header):
+    """Check a header against the schema and return the declared columns it has."""
+    schema = get_schema(name)
+    missing = [c for c in schema.columns if c not in header]
+    if missing:
+        raise SchemaError(f"{schema.name}: missing columns {missing}")
+    extra = [c for c in header if c not in schema.columns]
+    if extra:
+        logger.warning(f"{schema.name}: ignoring undeclared columns {extra}")
+    return [c for c in header if c in schema.columns]
+
+
+def parse_dates(name, values):
+    """Parse a column of timestamps with the dataset's exact format."""
+    import pandas as pd
+
+    schema = get_schema(name)
+    try:
+        return pd.to_datetime(values, format=schema.date_format)
+    except (ValueError, TypeError) as e:
+        raise SchemaError(f"{schema.name}: {config.DATE_COLUMN} does not match "
+                          f"{schema.date_format!r}: {e}") from None
+
+
+def aqi_bucket(aqi):
+    """AQI_Bucket value for each AQI in ``aqi`` (array), from ``config.AQI_CATEGORIES``."""
+    import numpy as np
+
+    names = np.array(list(config.AQI_CATEGORIES), dtype=object)
+    # A category holds the values above the upper bound of the one below it
+    upper = np.array([c["range"][1] for c in config.AQI_CATEGORIES.values()])
+    buckets = names[np.clip(np.searchsorted(upper, aqi, side="left"), 0, len(names) - 1)]
+    buckets[np.isnan(aqi)] = None
+    return buckets
+
+
+def load_dataset(name, columns=None, raw=False, path=None, categorical=False,
+                 cities=None, start=None, end=None, sample=None):
+    """
+    Load a dataset as declared in the registry.
+
+    ``columns`` restricts the load to a subset of declared columns, ``raw``
+    reads the file in data/raw instead of data/processed, and ``path``
+    overrides the location entirely (e.g. for a new file dropped by a logger).
+    ``categorical`` loads the text columns (City, Station, AQI_Bucket) as
+    pandas categoricals, which keeps large tables compact and gives integer
+    codes to group on.
+
+    ``cities``, ``start`` and ``end`` keep only rows of those cities within
+    the (inclusive) date range. If the processed dataset has been
+    partitioned (scripts/partitions.py), only the matching partitions are
+    read; otherwise the whole file is read and filtered.
+
+    ``sample`` loads a cached stratified sample of that fraction of the
+    processed dataset (scripts/sampling.py). It defaults to
+    config.SAMPLE_FRACTION, so sample mode applies to every script; pass
+    ``sample=0`` where the full data is required.
+    """
+    import pandas as pd
+
+    schema = get_schema(name)
+    filtered = cities is not None or start is not None or end is not None
+    sample = config.SAMPLE_FRACTION if sample is None else sample
+    if 0 < sample < 1 and not raw and path is None and schema.date_column and "City" in schema.columns:
+        from sampling import load_sample
+
+        needed = _with_filter_columns(schema, columns, cities, start, end)
+        df = load_sample(schema.name, sample, columns=_with_strata_columns(schema, needed))
+        if filtered:
+            df = _filter_rows(schema, df, cities, start, end)
+        return _finish(df, columns, categorical)
+    if filtered and not raw and path is None:
+        from partitions import load_catalog, load_partitions
+
+        catalog = load_catalog(schema)
+        if catalog is not None:
+            needed = _with_filter_columns(schema, columns, cities, start, end)
+            df = load_partitions(schema, catalog, needed, cities, start, end)
+            return _finish(_filter_rows(schema, df, cities, start, end), columns, categorical)
+
+    path = path or (schema.raw_path if raw else schema.path)
+    if not Path(path).exists():
+        raise FileNotFoundError(f"{schema.name}: file not found: {path}")
+
+    available = validate_header(schema, read_header(path))
+    if columns is None:
+        usecols = available
+    else:
+        unknown = [c for c in columns if c not in schema.columns]
+        if unknown:
+            raise SchemaError(f"{schema.name}: unknown columns requested {unknown}")
+        usecols = _with_filter_columns(schema, columns, cities, start, end)
+
+    date_col = schema.date_column
+    dtype = {c: schema.dtypes[c] for c in usecols if c != date_col}
+    if categorical:
+        dtype.update({c: "category" for c, t in dtype.items() if t == TEXT})
+    if date_col in usecols:
+        dtype[date_col] = TEXT
+
+    df = pd.read_csv(path, usecols=usecols, dtype=dtype)[usecols]
+    if date_col in usecols:
+        df[date_col] = parse_dates(schema, df[date_col])
+    if filtered:
+        df = _finish(_filter_rows(schema, df, cities, start, end), columns, False)
+    return df
+
+
+def _with_filter_columns(schema, columns, cities, start, end):
+    # Columns to read so the row filters can be applied
+    if columns is None:
+        return None
+    extra = []
+    if cities is not None and "City" not in columns:
+        extra.append("City")
+    if (start is not None or end is not None) and schema.date_column not in columns:
+        extra.append(schema.date_column)
+    return list(columns) + extra
+
+
+def _with_strata_columns(schema, columns):
+    # Sample estimates need each row's City x year x month stratum
+    if columns is None:
+        return None
+    return list(columns) + [c for c in ("City", schema.date_column) if c not in columns]
+
+
+def date_bounds(name, start=None, end=None):
+    """Inclusive (start, end) Timestamps of a date filter on ``name``; None stays None."""
+    import pandas as pd
+
+    schema = get_schema(name)
+    start = pd.Timestamp(start) if start is not None else None
+    if end is not None:
+        # A bare date as the end includes that whole day
+        end = pd.Timestamp(end)
+        if schema.hourly and end == end.normalize():
+            end += pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return start, end
+
+
+def _filter_rows(schema, df, cities, start, end):
+    import pandas as pd
+
+    start, end = date_bounds(schema, start, end)
+    keep = pd.Series(True, index=df.index)
+    if cities is not None:
+        keep &= df["City"].isin(list(cities))
+    if start is not None:
+        keep &= df[schema.date_column] >= start
+    if end is not None:
+        keep &= df[schema.date_column] <= end
+    return df[keep].reset_index(drop=True)
+
+
+def _finish(df, columns, categorical):
+    if columns is not None:
+        df = df[list(columns)]
+    if categorical:
+        df = df.astype({c: "category" for c in df.columns if df[c].dtype == object})
+    return df
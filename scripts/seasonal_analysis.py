@@ -1,29 +1,18 @@
 # scripts/seasonal_trends.py
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
+import sys
+from pathlib import Path
 
-PROCESSED = "../data/processed/"
-VISUALS = "../visuals/"
-OUTPUT = "../output/"
-
-os.makedirs(VISUALS, exist_ok=True)
-os.makedirs(OUTPUT, exist_ok=True)
+import matplotlib.pyplot as plt
+import seaborn as sns
 
-# helper to detect date column
-POSSIBLE_DATE_COLUMNS = ["Date","date","Datetime","datetime","timestamp","Timestamp","DateTime"]
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from sampling import group_estimates, label, save_intervals
+from schema import load_dataset
 
-def find_date_col(df):
-    for c in POSSIBLE_DATE_COLUMNS:
-        if c in df.columns:
-            return c
-    # fallback: try any datetime-like column
-    for c in df.columns:
-        if "date" in c.lower() or "time" in c.lower():
-            return c
-    return None
+VISUALS = config.VISUALS_DIR
+OUTPUT = config.OUTPUT_DIR
 
 def season_of_month(m):
     # DJF (winter), MAM (spring), JJA (summer), SON (autumn)
@@ -36,15 +25,13 @@ def season_of_month(m):
     return "Autumn (SON)"
 
 def main():
-    file = PROCESSED + "city_day_cleaned.csv"
+    os.makedirs(VISUALS, exist_ok=True)
+    os.makedirs(OUTPUT, exist_ok=True)
+
+    file = config.CITY_DAY_CLEANED
     print("Loading:", file)
-    df = pd.read_csv(file)
-    date_col = find_date_col(df)
-    if not date_col:
-        print("No date column found. Exiting.")
-        return
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col])
+    df = load_dataset("city_day")
+    date_col = config.DATE_COLUMN
     df["year"] = df[date_col].dt.year
     df["month"] = df[date_col].dt.month
     df["season"] = df["month"].apply(season_of_month)
@@ -57,21 +44,36 @@ def main():
 
     print("Pollutants detected:", pollutant_cols)
 
-    # seasonal means across entire dataset
-    season_mean = df.groupby("season")[pollutant_cols].mean().reindex(["Winter (DJF)","Spring (MAM)","Summer (JJA)","Autumn (SON)"])
-    season_mean.to_csv(OUTPUT + "seasonal_means_by_pollutant.csv")
-    print("Saved seasonal means:", OUTPUT + "seasonal_means_by_pollutant.csv")
+    # seasonal means across entire dataset (stratified estimates in sample mode)
+    tag = label(df)
+    seasons = ["Winter (DJF)","Spring (MAM)","Summer (JJA)","Autumn (SON)"]
+    est = group_estimates(df, ["season"], pollutant_cols)
+    season_mean = est.pivot(index="season", columns="column", values="mean").reindex(seasons)[pollutant_cols]
+    season_mean.columns.name = None
+    out = os.path.join(OUTPUT, "seasonal_means_by_pollutant.csv")
+    season_mean.to_csv(out)
+    print("Saved seasonal means:", out)
+    ci_out = save_intervals(est, out)
+    if ci_out:
+        print(f"Saved confidence intervals{tag}:", ci_out)
+    half_width = (est.assign(hw=est["mean"] - est["ci_low"])
+                  .pivot(index="season", columns="column", values="hw").reindex(seasons))
 
     # Plot each pollutant seasonal bar chart
     for col in pollutant_cols:
         plt.figure(figsize=(7,5))
         sns.barplot(x=season_mean.index, y=season_mean[col].values, palette="viridis")
-        plt.title(f"Seasonal average — {col}", fontsize=16, fontweight='bold')
+        if tag:
+            plt.errorbar(range(len(seasons)), season_mean[col].values, yerr=half_width[col].values,
+                         fmt="none", ecolor="black", capsize=6)
+            plt.title(f"Seasonal average — {col}\n{tag.strip()}", fontsize=12, fontweight='bold')
+        else:
+            plt.title(f"Seasonal average — {col}", fontsize=16, fontweight='bold')
         plt.ylabel(col, fontsize=14)
         plt.xlabel("", fontsize=14)
         plt.xticks(rotation=15)
         plt.grid(axis='y', linestyle='--', alpha=0.7)
-        fn = VISUALS + f"seasonal_{col.replace('.','').lower()}.png"
+        fn = os.path.join(VISUALS, f"seasonal_{col.replace('.','').lower()}.png")
         plt.tight_layout()
         plt.savefig(fn, dpi=200)
         plt.close()
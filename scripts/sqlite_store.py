@@ -0,0 +1,329 @@
+"""
+Indexed SQLite copy of the processed datasets for ad-hoc point and range
+queries.
+
+Each dataset is one table in data/processed/air_quality.db. The tables are
+``WITHOUT ROWID`` with the series key (City, [Station,] Datetime) as
+primary key, so rows are stored clustered in key order. The primary key
+therefore works as a covering index: a lookup for one station between two
+timestamps is a single index seek plus a scan of adjacent rows, with no
+extra table reads. A secondary index on (City, AQI), which also carries the
+key columns, serves threshold queries such as "AQI > 300 in Mumbai".
+
+Datetime is stored as text in the dataset's fixed format, so string order
+is time order. The import streams each CSV in chunks into batched
+``executemany`` calls inside one transaction, then builds the AQI index.
+The database runs in WAL mode, so any number of reader processes can query
+it while it is being refreshed. A table is re-imported only when its CSV
+has changed since the last import.
+
+    python scripts/aqi.py store                       # import what changed
+    python scripts/aqi.py store --rebuild --datasets station_hour
+
+    from sqlite_store import Store
+    with Store() as db:
+        db.series("station_hour", station="Station_D2", columns=["PM2.5"],
+                  start="2015-01-05", end="2015-01-06")
+        db.where("city_day", "AQI > ?", [300], city="Mumbai")
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import SCHEMAS, SchemaError, date_bounds, get_schema, parse_dates, read_header, validate_header
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BATCH_SIZE = 50_000  # rows per executemany call
+CHUNK_SIZE = 200_000  # rows per CSV chunk
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _key(schema):
+    # (City, Station, Datetime): a series is contiguous and in time order
+    return list(schema.keys) + ([schema.date_column] if schema.date_column else [])
+
+
+def _python_values(column):
+    # Plain Python values for sqlite3, with NaN as NULL
+    values = column.tolist()
+    if column.hasnans:
+        values = [None if v != v else v for v in values]
+    return values
+
+
+def create_table_sql(schema):
+    columns = ", ".join(f"{_quote(c)} {'REAL' if schema.dtypes.get(c) == 'float64' else 'TEXT'}"
+                        + (" NOT NULL" if c in _key(schema) else "")
+                        for c in schema.columns)
+    key = ", ".join(_quote(c) for c in _key(schema))
+    return f"CREATE TABLE {_quote(schema.name)} ({columns}, PRIMARY KEY ({key})) WITHOUT ROWID"
+
+
+def connect(path=None, readonly=False, timeout=30.0):
+    """
+    Connection to the store. Read-only connections never block writers or
+    other readers (WAL); ``check_same_thread`` is off so one connection can
+    be shared by a thread pool that serialises its use.
+    """
+    path = path or config.SQLITE_DB
+    if readonly:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"SQLite store not found: {path} (run `aqi store` first)")
+        conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True,
+                               timeout=timeout, check_same_thread=False)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Transactions are explicit (BEGIN/COMMIT), so DDL is part of them too
+        conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS _imports "
+                     "(dataset TEXT PRIMARY KEY, source TEXT, mtime REAL, size INTEGER, rows INTEGER)")
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+    return conn
+
+
+def is_current(conn, schema):
+    """True if the table was imported from the CSV as it is now."""
+    row = conn.execute("SELECT mtime, size FROM _imports WHERE dataset = ?", (schema.name,)).fetchone()
+    stat = os.stat(schema.path)
+    return row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size
+
+
+def import_dataset(conn, name, batch_size=BATCH_SIZE, chunksize=CHUNK_SIZE):
+    """
+    (Re)build the table of ``name`` from its processed CSV in one
+    transaction; readers see the old table until it commits. Returns the
+    number of rows stored: a repeated key replaces the earlier row.
+    """
+    import pandas as pd
+
+    schema = get_schema(name)
+    header = validate_header(schema, read_header(schema.path))
+    stat = os.stat(schema.path)
+    key = _key(schema)
+    columns = list(schema.columns)
+    dtype = {c: ("float64" if schema.dtypes.get(c) == "float64" else str) for c in header}
+    placeholders = ", ".join("?" * len(columns))
+    insert = (f"INSERT OR REPLACE INTO {_quote(schema.name)} ({', '.join(_quote(c) for c in columns)}) "
+              f"VALUES ({placeholders})")
+
+    inserted = dropped = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(schema.name)}")
+        conn.execute(create_table_sql(schema))
+        for chunk in pd.read_csv(schema.path, usecols=header, dtype=dtype, chunksize=chunksize):
+            chunk = chunk.reindex(columns=columns)
+            complete = chunk[key].notna().all(axis=1)
+            dropped += int((~complete).sum())
+            chunk = chunk[complete]
+            records = zip(*(_python_values(chunk[c]) for c in columns))
+            while True:
+                batch = [r for _, r in zip(range(batch_size), records)]
+                if not batch:
+                    break
+                conn.executemany(insert, batch)
+            inserted += len(chunk)
+        if "AQI" in columns:
+            # City first: "AQI > x in a city" is one seek, and across all
+            # cities SQLite skip-scans the handful of City values
+            conn.execute(f"CREATE INDEX {_quote(f'{schema.name}_aqi')} "
+                         f"ON {_quote(schema.name)} (City, AQI)")
+        rows = conn.execute(f"SELECT count(*) FROM {_quote(schema.name)}").fetchone()[0]
+        conn.execute("INSERT OR REPLACE INTO _imports VALUES (?, ?, ?, ?, ?)",
+                     (schema.name, schema.path, stat.st_mtime, stat.st_size, rows))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute(f"ANALYZE {_quote(schema.name)}")
+    if dropped:
+        logging.warning(f"{schema.name}: skipped {dropped} rows with an empty {'/'.join(key)}")
+    if inserted > rows:
+        logging.warning(f"{schema.name}: {inserted - rows} rows repeat an earlier {'/'.join(key)}; "
+                        f"the last one was kept")
+    return rows
+
+
+class Store:
+    """
+    Read-only query API over the SQLite store; results are DataFrames with
+    Datetime parsed. Open one Store per process (or thread).
+    """
+
+    def __init__(self, path=None):
+        self.conn = connect(path, readonly=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def query(self, sql, params=(), dataset=None):
+        """
+        Run any SELECT. A Datetime column in the result is parsed with the
+        format of ``dataset``; without one, with the first declared format
+        that fits (daily or hourly text as stored).
+        """
+        import pandas as pd
+
+        df = pd.read_sql_query(sql, self.conn, params=list(params))
+        if config.DATE_COLUMN in df:
+            names = [dataset] if dataset else list({s.date_format: n for n, s in SCHEMAS.items()
+                                                     if s.date_format}.values())
+            for i, name in enumerate(names):
+                try:
+                    df[config.DATE_COLUMN] = parse_dates(name, df[config.DATE_COLUMN])
+                    break
+                except SchemaError:
+                    if i == len(names) - 1:
+                        raise
+        return df
+
+    def _select(self, dataset, columns, conditions, params, order=True):
+        schema = get_schema(dataset)
+        if columns is None:
+            selected = list(schema.columns)
+        else:
+            unknown = [c for c in columns if c not in schema.columns]
+            if unknown:
+                raise KeyError(f"{schema.name}: unknown columns {unknown}")
+            selected = [c for c in _key(schema) if c not in columns] + list(columns)
+        sql = f"SELECT {', '.join(_quote(c) for c in selected)} FROM {_quote(schema.name)}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if order:
+            sql += " ORDER BY " + ", ".join(_quote(c) for c in _key(schema))
+        return self.query(sql, params, dataset)
+
+    @staticmethod
+    def _filters(schema, city, station, start, end):
+        conditions, params = [], []
+        for column, value in (("City", city), ("Station", station)):
+            if value is None:
+                continue
+            if column not in schema.columns:
+                raise KeyError(f"{schema.name} has no {column} column")
+            values = [value] if isinstance(value, str) else list(value)
+            conditions.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+            params += values
+        if (start is not None or end is not None) and not schema.date_column:
+            raise KeyError(f"{schema.name} has no {config.DATE_COLUMN} column")
+        date_col = _quote(schema.date_column) if schema.date_column else None
+        start, end = date_bounds(schema, start, end)
+        if start is not None:
+            conditions.append(f"{date_col} >= ?")
+            params.append(start.strftime(schema.date_format))
+        if end is not None:
+            conditions.append(f"{date_col} <= ?")
+            params.append(end.strftime(schema.date_format))
+        return conditions, params
+
+    def series(self, dataset, city=None, station=None, start=None, end=None, columns=None):
+        """
+        Rows of one or more cities/stations within [start, end], in key
+        order: a primary-key seek and range scan.
+        """
+        schema = get_schema(dataset)
+        conditions, params = self._filters(schema, city, station, start, end)
+        return self._select(dataset, columns, conditions, params)
+
+    def point(self, dataset, when, city=None, station=None, columns=None):
+        """The row(s) at exactly one timestamp."""
+        import pandas as pd
+
+        schema = get_schema(dataset)
+        conditions, params = self._filters(schema, city, station, None, None)
+        conditions.append(f"{_quote(schema.date_column)} = ?")
+        params.append(pd.Timestamp(when).strftime(schema.date_format))
+        return self._select(dataset, columns, conditions, params)
+
+    def where(self, dataset, condition, params=(), city=None, station=None, start=None, end=None,
+              columns=None):
+        """
+        Rows matching an SQL ``condition`` on the measures (e.g. "AQI > ?"),
+        optionally limited to cities, stations and a date range.
+        """
+        schema = get_schema(dataset)
+        conditions, filter_params = self._filters(schema, city, station, start, end)
+        # No ORDER BY: it would make SQLite walk the primary key to avoid a
+        # sort instead of seeking the AQI index; the result is sorted here
+        df = self._select(dataset, columns, [f"({condition})"] + conditions, list(params) + filter_params,
+                          order=False)
+        return df.sort_values(_key(schema), ignore_index=True)
+
+    def plan(self, sql, params=()):
+        """SQLite's query plan, to check a lookup is an index seek."""
+        return [row[-1] for row in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", list(params))]
+
+
+def _benchmark(path):
+    # Typical lookups against the first imported station/city table
+    with Store(path) as db:
+        db.query("SELECT 1")  # first query pays for loading pandas' SQL support
+        tables = {r[0] for r in db.conn.execute("SELECT dataset FROM _imports")}
+        for name in ("station_hour", "station_day", "city_hour", "city_day"):
+            if name not in tables:
+                continue
+            schema = get_schema(name)
+            first = db.conn.execute(f"SELECT * FROM {_quote(name)} LIMIT 1").fetchone()
+            labels = dict(zip(schema.columns, first))
+            key = {"city": labels["City"], "station": labels.get("Station")}
+            timings = {}
+            for label_, run in (
+                ("point", lambda: db.point(name, labels[schema.date_column], **key)),
+                ("range", lambda: db.series(name, **key, start=labels[schema.date_column],
+                                            end=labels[schema.date_column][:10])),
+                ("AQI > 300", lambda: db.where(name, "AQI > ?", [300], city=labels["City"])),
+            ):
+                started = time.perf_counter()
+                result = run()
+                timings[label_] = f"{(time.perf_counter() - started) * 1000:.1f} ms ({len(result)} rows)"
+            logging.info(f"{name} lookups: " + ", ".join(f"{k} {v}" for k, v in timings.items()))
+
+
+def main(datasets=None, rebuild=False, benchmark=True):
+    datasets = list(datasets or SCHEMAS)
+    conn = connect()
+    status = 0
+    try:
+        for name in datasets:
+            schema = get_schema(name)
+            if not os.path.exists(schema.path):
+                logging.warning(f"{name}: processed file not found; skipping")
+                status = 1
+                continue
+            if not rebuild and is_current(conn, schema):
+                logging.info(f"{name}: up to date")
+                continue
+            started = time.perf_counter()
+            rows = import_dataset(conn, name)
+            elapsed = time.perf_counter() - started
+            logging.info(f"{name}: imported {rows} rows in {elapsed:.2f}s "
+                         f"({rows / max(elapsed, 1e-9) / 1e6:.2f} M rows/s)")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    logging.info(f"SQLite store: {config.SQLITE_DB}")
+    if benchmark:
+        _benchmark(config.SQLITE_DB)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
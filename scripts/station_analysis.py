@@ -1,21 +1,26 @@
-import pandas as pd
+import os
+import sys
+from pathlib import Path
+
 import matplotlib.pyplot as plt
 import numpy as np
-import os
 
-PROCESSED_PATH = "../data/processed/"
-OUTPUT_PATH = "../output/"
-VISUALS_PATH = "../visuals/"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import load_dataset
 
-# Create folders if missing
-os.makedirs(OUTPUT_PATH, exist_ok=True)
-os.makedirs(VISUALS_PATH, exist_ok=True)
+OUTPUT_PATH = config.OUTPUT_DIR
+VISUALS_PATH = config.VISUALS_DIR
 
 def analyze_stations():
-    file_path = PROCESSED_PATH + "stations_cleaned.csv"
+    # Create folders if missing
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+    os.makedirs(VISUALS_PATH, exist_ok=True)
+
+    file_path = config.STATIONS_CLEANED
 
     print(f"📌 Loading: {file_path}")
-    df = pd.read_csv(file_path)
+    df = load_dataset("stations")
 
     print("Columns found:", df.columns.tolist())
 
@@ -31,7 +36,7 @@ def analyze_stations():
     print(station_counts)
 
     # Save summary
-    summary_file = OUTPUT_PATH + "stations_summary.csv"
+    summary_file = os.path.join(OUTPUT_PATH, "stations_summary.csv")
     station_counts.to_csv(summary_file)
     print(f"✅ Saved station summary: {summary_file}")
 
@@ -46,7 +51,7 @@ def analyze_stations():
     plt.grid(axis='y', linestyle='--', alpha=0.7)
     plt.tight_layout()
 
-    img_path = VISUALS_PATH + "stations_per_city.png"
+    img_path = os.path.join(VISUALS_PATH, "stations_per_city.png")
     plt.savefig(img_path)
     print(f"📊 Saved plot: {img_path}")
     plt.close()
@@ -0,0 +1,275 @@
+"""
+Trend significance for every City/Station x pollutant series: seasonal
+Mann-Kendall test and seasonal Sen's slope.
+
+The seasons are calendar months. Observations are compared only with others
+from the same month, so the annual cycle is not mistaken for a trend. Both
+statistics avoid the O(n^2) pair loop:
+
+- Mann-Kendall S = P - Q over pairs in time order. Q is the number of
+  inversions of the values, counted with a bottom-up merge sort in NumPy,
+  and tied pairs follow from value counts. So S = pairs - ties - 2Q in
+  O(n log n).
+- Sen's slope is the median of all pairwise slopes. A pair (i < j) has slope
+  <= theta exactly when y_j <= y_i for y = x - theta * t, so the number of
+  slopes below any theta is again an inversion count. The median is found
+  by bisection on theta, without materialising the slopes. For an even
+  number of pairs the upper middle slope is the smallest one above the
+  lower, which lies between neighbouring values of y in one more pass.
+
+Series are spread over a process pool. The table is written to
+output/trend_stats.csv, next to city_yearly_avg.csv.
+
+    python scripts/aqi.py trend-stats --datasets city_day station_day --alpha 0.01
+"""
+
+import logging
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import get_schema, load_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TREND_FILE = os.path.join(config.OUTPUT_DIR, "trend_stats.csv")
+STEPS_PER_YEAR = {"D": 365.25, "h": 365.25 * 24}
+
+
+def count_inversions(values):
+    """Number of pairs i < j with values[i] > values[j], by bottom-up merge sort."""
+    n = len(values)
+    if n < 2:
+        return 0
+    # Dense integer ranks: equal values never count as inverted
+    return _rank_inversions(np.unique(values, return_inverse=True)[1].astype(np.int64).ravel())
+
+
+def _rank_inversions(a):
+    n = len(a)
+    positions = np.arange(n)
+    inversions = 0
+    width = 1
+    while width < n:
+        block = positions // width
+        pair = block // 2
+        right = (block % 2).astype(bool)
+        # Left blocks are sorted, so offsetting each by its pair makes all of
+        # them one sorted array that a single searchsorted can query
+        keys = pair * n + a
+        left = keys[~right]
+        above = np.searchsorted(left, (pair[right] + 1) * n) - np.searchsorted(left, keys[right], side="right")
+        inversions += int(above.sum())
+        # Merge each pair of sorted blocks (two sorted runs: cheap for timsort)
+        a = np.sort(keys, kind="stable") - pair * n
+        width *= 2
+    return inversions
+
+
+def _tied_pairs(values):
+    counts = np.unique(values, return_counts=True)[1]
+    return int((counts * (counts - 1) // 2).sum()), float((counts * (counts - 1) * (2 * counts + 5)).sum())
+
+
+def mann_kendall_s(values):
+    """Mann-Kendall S and its variance (with tie correction) for values in time order."""
+    n = len(values)
+    pairs = n * (n - 1) // 2
+    ties, tie_term = _tied_pairs(values)
+    s = pairs - ties - 2 * count_inversions(values)
+    var = (n * (n - 1) * (2 * n + 5) - tie_term) / 18.0
+    return s, var
+
+
+def _slopes_at_most(season, t, x, theta):
+    # Number of within-season pairs (i < j in time) with slope <= theta.
+    # Rows are ordered by (season, time); ranking y within its season keeps
+    # pairs from different seasons from ever counting as inverted or tied.
+    y = x - theta * t
+    order = np.lexsort((y, season))
+    ys, ss = y[order], season[order]
+    new = np.ones(len(y), dtype=bool)
+    new[1:] = (ys[1:] != ys[:-1]) | (ss[1:] != ss[:-1])
+    ranks = np.empty(len(y), dtype=np.int64)
+    ranks[order] = np.cumsum(new) - 1
+    runs = np.diff(np.append(np.flatnonzero(new), len(y)))
+    return _rank_inversions(ranks) + int((runs * (runs - 1) // 2).sum())
+
+
+def _next_slope_above(season, t, x, theta):
+    # Smallest within-season pairwise slope > theta. A pair has slope > theta
+    # when y rises with time, for y = x - theta * t. Between any two y levels
+    # of a season lies a pair of neighbouring levels with a smaller such slope,
+    # so only neighbours are compared: the earliest reading of the lower level
+    # against the latest reading of the upper one.
+    y = x - theta * t
+    order = np.lexsort((y, season))
+    ys, ss, ts = y[order], season[order], t[order]
+    new = np.ones(len(y), dtype=bool)
+    new[1:] = (ys[1:] != ys[:-1]) | (ss[1:] != ss[:-1])
+    starts = np.flatnonzero(new)
+    first, last = np.minimum.reduceat(ts, starts), np.maximum.reduceat(ts, starts)
+    level, level_season = ys[starts], ss[starts]
+    dt = last[1:] - first[:-1]
+    ok = (level_season[1:] == level_season[:-1]) & (dt > 0)
+    return theta + ((level[1:] - level[:-1])[ok] / dt[ok]).min()
+
+
+def sen_slope(seasons, tol=1e-10, max_iter=200):
+    """
+    Median of the within-season pairwise slopes, by bisection on the slope.
+
+    ``seasons`` is a list of (times, values) with strictly increasing times.
+    """
+    seasons = [(t, x) for t, x in seasons if len(t) > 1]
+    pairs = sum(len(t) * (len(t) - 1) // 2 for t, _ in seasons)
+    if pairs == 0:
+        return np.nan
+    season = np.repeat(np.arange(len(seasons)), [len(t) for t, _ in seasons])
+    t = np.concatenate([t for t, _ in seasons]).astype(np.float64)
+    x = np.concatenate([x for _, x in seasons])
+    span = max(np.ptp(x) for _, x in seasons)
+    step = min(np.diff(t).min() for t, _ in seasons)
+    lo, hi = -span / step - 1.0, span / step + 1.0
+
+    # Narrow the bracket with the quantiles of a random sample of slopes
+    rng = np.random.default_rng(0)
+    i = rng.integers(0, len(t), 4096)
+    j = rng.integers(0, len(t), 4096)
+    ok = (season[i] == season[j]) & (t[i] != t[j])
+    if ok.sum() > 100:
+        sample = np.sort((x[j[ok]] - x[i[ok]]) / (t[j[ok]] - t[i[ok]]))
+        q_lo, q_hi = sample[int(0.3 * len(sample))], sample[int(0.7 * len(sample))]
+        if _slopes_at_most(season, t, x, q_lo) < pairs // 2 \
+                and _slopes_at_most(season, t, x, q_hi) >= pairs // 2 + 1:
+            lo, hi = q_lo, q_hi
+
+    def kth(k, lo, hi):
+        # Smallest theta with at least k slopes <= theta
+        for _ in range(max_iter):
+            if hi - lo <= tol * max(1.0, abs(hi)):
+                break
+            mid = (lo + hi) / 2
+            if _slopes_at_most(season, t, x, mid) >= k:
+                hi = mid
+            else:
+                lo = mid
+        return hi
+
+    if pairs % 2:
+        return kth(pairs // 2 + 1, lo, hi)
+    # The upper middle slope is the lower one again or the next slope above it
+    lower = kth(pairs // 2, lo, hi)
+    if _slopes_at_most(season, t, x, lower) > pairs // 2:
+        return lower
+    return (lower + _next_slope_above(season, t, x, lower)) / 2
+
+
+def seasonal_trend(steps, values, months, steps_per_year, alpha=0.05):
+    """Seasonal Mann-Kendall test and Sen's slope (per year) of one series."""
+    valid = ~np.isnan(values)
+    steps, values, months = steps[valid], values[valid], months[valid]
+    seasons = []
+    s_total, var_total, pairs = 0, 0.0, 0
+    for month in np.unique(months):
+        sel = months == month
+        t, x = steps[sel], values[sel]
+        if len(x) < 2:
+            continue
+        s, var = mann_kendall_s(x)
+        s_total += s
+        var_total += var
+        pairs += len(x) * (len(x) - 1) // 2
+        seasons.append((t, x))
+
+    if var_total > 0:
+        z = (s_total - np.sign(s_total)) / math.sqrt(var_total)
+        p = math.erfc(abs(z) / math.sqrt(2))
+    else:
+        z, p = 0.0, 1.0
+    slope = sen_slope(seasons) * steps_per_year
+    direction = "no trend"
+    if p < alpha:
+        direction = "increasing" if s_total > 0 else "decreasing"
+    return {
+        "n": int(valid.sum()), "seasons": len(seasons), "S": int(s_total), "var_S": var_total,
+        "Z": z, "tau": s_total / pairs if pairs else np.nan, "p_value": p,
+        "sen_slope_per_year": slope, "direction": direction,
+    }
+
+
+def _trend_task(task):
+    labels, steps, values, months, steps_per_year, alpha = task
+    return {**labels, **seasonal_trend(steps, values, months, steps_per_year, alpha)}
+
+
+def series_tasks(dataset, pollutants=None, alpha=0.05):
+    """One task per group x pollutant of ``dataset``, from a single sort."""
+    import pandas as pd
+
+    schema = get_schema(dataset)
+    pollutants = list(pollutants or schema.measures)
+    keys = list(schema.keys)
+    # Mann-Kendall and Sen's slope need every observation of a series
+    df = load_dataset(dataset, columns=keys + [schema.date_column] + pollutants, sample=0)
+    # Timestamps are unique per series; several readings (e.g. duplicates) are averaged
+    df = df.groupby(keys + [schema.date_column], sort=True, observed=True)[pollutants].mean().reset_index()
+
+    unit = "h" if schema.hourly else "D"
+    times = df[schema.date_column].to_numpy(f"datetime64[{unit}]")
+    steps = times.astype(np.int64)
+    months = times.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    codes, _ = pd.factorize(pd.MultiIndex.from_frame(df[keys]))
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(df)]])
+
+    for lo, hi in zip(starts, ends):
+        labels = {"dataset": dataset, **{k: df[k].iat[lo] for k in keys}}
+        for pollutant in pollutants:
+            yield ({**labels, "pollutant": pollutant}, steps[lo:hi], df[pollutant].to_numpy(np.float64)[lo:hi],
+                   months[lo:hi], STEPS_PER_YEAR[unit], alpha)
+
+
+def main(datasets=("city_day", "station_day"), pollutants=None, alpha=0.05, workers=None):
+    import pandas as pd
+
+    tasks = []
+    for dataset in datasets:
+        if not os.path.exists(get_schema(dataset).path):
+            logging.warning(f"{dataset}: processed file not found; skipping")
+            continue
+        tasks.extend(series_tasks(dataset, pollutants, alpha))
+    if not tasks:
+        logging.warning("No series to test.")
+        return 1
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    logging.info(f"Testing {len(tasks)} series on {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(_trend_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+    table = pd.DataFrame(rows)
+    leading = [c for c in ("dataset", "City", "Station", "pollutant") if c in table]
+    table = table[leading + [c for c in table if c not in leading]]
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    table.to_csv(TREND_FILE, index=False)
+    logging.info(f"Saved trend table: {TREND_FILE}")
+
+    print(f"\nSignificant trends (alpha = {alpha}):")
+    print(table["direction"].value_counts().to_string())
+    first = table[(table["dataset"] == table["dataset"].iat[0]) & (table["pollutant"] == "AQI")]
+    if not first.empty:
+        labels = [c for c in ("City", "Station") if c in first and first[c].notna().any()]
+        print(f"\nAQI trend per group ({first['dataset'].iat[0]}):")
+        print(first[labels + ["sen_slope_per_year", "p_value", "direction"]].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
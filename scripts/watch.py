@@ -0,0 +1,329 @@
+"""
+Watch data/raw for new CSV files, ingest them and refresh affected outputs.
+
+Loggers drop per-station files into ``data/raw`` during the day. The watcher
+polls the directory with asyncio, and a burst of files is handled as one
+batch once nothing has changed for ``debounce`` seconds (or after
+``max_delay`` at the latest). A file that is still being written keeps
+changing size, so it is not picked up half-written.
+
+For each batch:
+
+1. Files are parsed and validated in a process pool, at most
+   ``concurrency`` at a time. The dataset of a file comes from its name
+   (``station_hour_<anything>.csv``) or, failing that, from its header.
+2. Each affected dataset is merged in a worker into its raw file
+   (``data/raw/<dataset>.csv``). Rows with a known key replace the old ones
+   and new rows are added. city_day is then rebuilt by ``aqi clean``; the
+   other datasets have no cleaning step, so the new rows go through
+   ``clean_data.clean_rows`` and are merged into their processed file the
+   same way.
+3. Only the ``aqi`` commands that read a changed dataset are re-run, after
+   cleaning and refreshing its partitions if it has been partitioned.
+
+The dataset files in ``data/raw`` are written by the watcher itself (and
+``city_hour.csv`` by derive-city-hour), so they are not watched.
+
+Progress is kept in ``output/watch/``. state.json records the files already
+ingested, so a restart does not ingest them again. status.json holds
+counters: files and rows ingested, failures, ingest lag and the duration of
+the last run. Nothing besides Python is needed; stop the watcher with
+Ctrl-C or SIGTERM.
+
+    python scripts/aqi.py watch --interval 5 --debounce 30
+    python scripts/aqi.py watch --once      # ingest what is new, then exit
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import config
+from schema import SCHEMAS, get_schema, load_dataset, read_header
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+WATCH_DIR = os.path.join(config.OUTPUT_DIR, "watch")
+STATE_FILE = os.path.join(WATCH_DIR, "state.json")
+STATUS_FILE = os.path.join(WATCH_DIR, "status.json")
+AQI = os.path.join(os.path.dirname(os.path.realpath(__file__)), "aqi.py")
+
+# aqi commands that read each dataset, in the order run_all uses
+AFFECTED = {
+    "city_day": ["clean", "analyze", "seasonal", "compare", "trends", "hotspots", "rank", "missing",
+                 "interactive", "example", "dashboard", "summary"],
+    "station_day": ["interactive", "dashboard"],
+    "city_hour": ["interactive", "dashboard"],
+    "station_hour": ["derive-city-hour", "interactive", "dashboard"],
+    "stations": ["stations", "summary"],
+}
+ORDER = ["clean", "stations", "derive-city-hour", "analyze", "seasonal", "compare", "trends", "hotspots", "rank",
+         "missing", "interactive", "example", "dashboard", "summary"]
+
+# Datasets whose processed file `aqi clean` rebuilds from the raw one
+CLEANED = {"city_day"}
+# Dataset files in the watched folder: written by merge_dataset and derive-city-hour, not new data
+GENERATED = {os.path.abspath(s.raw_path) for s in SCHEMAS.values()}
+
+
+def detect_dataset(path):
+    """Dataset a raw file belongs to, from its name or else its header."""
+    stem = Path(path).stem
+    for name in sorted(SCHEMAS, key=len, reverse=True):
+        if stem == name or stem.startswith(name + "_"):
+            return name
+    header = read_header(path)
+    if config.DATE_COLUMN not in header:
+        return "stations"
+    with open(path, encoding="utf-8") as f:
+        f.readline()
+        row = f.readline().split(",")
+    stamp = row[header.index(config.DATE_COLUMN)] if len(row) == len(header) else ""
+    level = "station" if "Station" in header else "city"
+    return f"{level}_{'hour' if len(stamp.strip()) > 10 else 'day'}"
+
+
+def parse_file(path):
+    """Worker: validate and parse one raw file; returns (dataset, DataFrame)."""
+    name = detect_dataset(path)
+    return name, load_dataset(name, path=path)
+
+
+def merge_dataset(name, frames):
+    """
+    Worker: merge new rows into the raw file of ``name``, and (cleaned)
+    into its processed file unless ``aqi clean`` rebuilds that; returns rows
+    written to the raw file.
+    """
+    import pandas as pd
+
+    from clean_data import clean_rows
+
+    schema = get_schema(name)
+    keys = [c for c in schema.columns if c in schema.keys or c == schema.date_column]
+    rows = pd.concat(frames, ignore_index=True).drop_duplicates(subset=keys, keep="last")
+    targets = [(schema.raw_path, True)]
+    if name not in CLEANED:
+        cleaned = clean_rows(rows, name)
+        if len(cleaned) < len(rows):
+            logging.warning(f"{name}: {len(rows) - len(cleaned)} new row(s) fail the cleaning rules; "
+                            f"kept in {schema.raw_path} only")
+        targets.append((schema.path, False))
+    for path, raw in targets:
+        new = rows if raw else cleaned
+        if os.path.exists(path):
+            # Always the full file: a sample here would be written back over it
+            current = load_dataset(name, raw=raw, sample=0)
+            # A re-sent key replaces the old row even if the new one is cleaned away
+            replaced = current.set_index(keys).index.isin(rows.set_index(keys).index)
+            merged = pd.concat([current[~replaced], new[current.columns]], ignore_index=True)
+        else:
+            merged = new[[c for c in schema.columns if c in new]]
+        if schema.date_column:
+            merged = merged.sort_values(schema.date_column, kind="stable")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        merged.to_csv(path + ".tmp", index=False, date_format=schema.date_format)
+        os.replace(path + ".tmp", path)
+    return len(rows)
+
+
+def scan(directory):
+    """{path: (mtime_ns, size)} of the CSV files in ``directory``, except GENERATED ones."""
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(".csv") and os.path.abspath(entry.path) not in GENERATED:
+                st = entry.stat()
+                files[entry.path] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def commands_for(datasets, partitioned=()):
+    """aqi command lines to refresh the outputs of ``datasets``."""
+    names = {c for d in datasets for c in AFFECTED.get(d, [])}
+    commands = [[c] for c in ORDER if c in names]
+    if partitioned:
+        # Partitions are split from the processed files, so after cleaning
+        commands.insert(int(commands[:1] == [["clean"]]), ["partition", "--datasets", *sorted(partitioned)])
+    return commands
+
+
+class Watcher:
+    def __init__(self, directory=config.RAW_DATA_DIR, interval=5.0, debounce=10.0, max_delay=60.0,
+                 concurrency=4, workers=None, rerun=True):
+        self.directory = directory
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.concurrency = concurrency
+        self.workers = workers or min(concurrency, os.cpu_count() or 1)
+        self.rerun = rerun
+        self.seen = {}
+        self.pending = {}
+        self.first_change = self.last_change = None
+        self.stop = None
+        self.counters = {
+            "started": time.time(), "batches": 0, "files_ingested": 0, "rows_ingested": 0,
+            "files_failed": 0, "runs_failed": 0, "pending_files": 0,
+            "last_ingest_lag_seconds": None, "max_ingest_lag_seconds": None,
+            "last_run_seconds": None, "last_run_at": None, "last_batch": [],
+        }
+
+    # -- state ---------------------------------------------------------
+
+    def load_state(self):
+        if os.path.exists(STATE_FILE):
+            with open(STATE_FILE, encoding="utf-8") as f:
+                self.seen = {p: tuple(sig) for p, sig in json.load(f).items()}
+            return True
+        return False
+
+    def save_state(self):
+        _write_json(STATE_FILE, self.seen)
+
+    def write_status(self):
+        self.counters["pending_files"] = len(self.pending)
+        _write_json(STATUS_FILE, self.counters)
+
+    # -- main loop -----------------------------------------------------
+
+    async def run(self, once=False):
+        os.makedirs(WATCH_DIR, exist_ok=True)
+        self.stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop.set)
+
+        if not self.load_state():
+            # First start: what is already there has been processed by hand
+            self.seen = await asyncio.to_thread(scan, self.directory)
+            self.save_state()
+            logging.info(f"Watching {self.directory}; {len(self.seen)} existing file(s) taken as ingested")
+        else:
+            logging.info(f"Watching {self.directory} every {self.interval:g}s "
+                         f"(debounce {self.debounce:g}s, {len(self.seen)} file(s) already ingested)")
+        self.write_status()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            while not self.stop.is_set():
+                await self.poll()
+                due = self.pending and (once or time.monotonic() - self.last_change >= self.debounce
+                                        or time.monotonic() - self.first_change >= self.max_delay)
+                if due:
+                    await self.process(pool)
+                if once and not self.pending:
+                    break
+                try:
+                    await asyncio.wait_for(self.stop.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        logging.info("Watcher stopped")
+        return 1 if self.counters["files_failed"] or self.counters["runs_failed"] else 0
+
+    async def poll(self):
+        files = await asyncio.to_thread(scan, self.directory)
+        now = time.monotonic()
+        for path, sig in files.items():
+            if self.seen.get(path) != sig and self.pending.get(path) != sig:
+                # New, or still growing: restart the debounce window
+                self.pending[path] = sig
+                self.last_change = now
+                self.first_change = self.first_change or now
+        for path in [p for p in self.pending if p not in files]:
+            del self.pending[path]
+        if not self.pending:
+            self.first_change = None
+
+    async def process(self, pool):
+        batch, self.pending, self.first_change = dict(self.pending), {}, None
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(self.concurrency)
+        logging.info(f"Ingesting {len(batch)} file(s)")
+
+        async def parse(path):
+            async with limit:
+                return await loop.run_in_executor(pool, parse_file, path)
+
+        paths = sorted(batch)
+        results = await asyncio.gather(*(parse(p) for p in paths), return_exceptions=True)
+        frames = {}
+        for path, result in zip(paths, results):
+            if isinstance(result, BaseException):
+                logging.error(f"Could not ingest {path}: {result}")
+                self.counters["files_failed"] += 1
+                continue
+            name, df = result
+            frames.setdefault(name, []).append(df)
+
+        async def merge(name, dfs):
+            async with limit:
+                return await loop.run_in_executor(pool, merge_dataset, name, dfs)
+
+        names = sorted(frames)
+        merged = await asyncio.gather(*(merge(n, frames[n]) for n in names), return_exceptions=True)
+        changed = []
+        for name, result in zip(names, merged):
+            if isinstance(result, BaseException):
+                logging.error(f"Could not update {name}: {result}")
+                self.counters["files_failed"] += len(frames[name])
+                continue
+            changed.append(name)
+            self.counters["rows_ingested"] += result
+            self.counters["files_ingested"] += len(frames[name])
+            logging.info(f"{name}: merged {result} row(s) from {len(frames[name])} file(s)")
+
+        # Failed files are not retried until they change again
+        self.seen.update(batch)
+        self.save_state()
+        lag = time.time() - min(sig[0] for sig in batch.values()) / 1e9
+        self.counters["batches"] += 1
+        self.counters["last_batch"] = [os.path.basename(p) for p in paths]
+        self.counters["last_ingest_lag_seconds"] = round(lag, 3)
+        self.counters["max_ingest_lag_seconds"] = round(max(lag, self.counters["max_ingest_lag_seconds"] or 0), 3)
+        self.write_status()
+
+        if changed and self.rerun:
+            await self.refresh(changed)
+
+    async def refresh(self, datasets):
+        from partitions import load_catalog
+
+        partitioned = [d for d in datasets if d in SCHEMAS and SCHEMAS[d].date_column and load_catalog(d)]
+        started = time.monotonic()
+        for command in commands_for(datasets, partitioned):
+            if self.stop.is_set():
+                break
+            proc = await asyncio.create_subprocess_exec(sys.executable, AQI, *command,
+                                                        stdout=asyncio.subprocess.DEVNULL)
+            if await proc.wait() != 0:
+                self.counters["runs_failed"] += 1
+                logging.error(f"`aqi {' '.join(command)}` failed")
+        self.counters["last_run_seconds"] = round(time.monotonic() - started, 3)
+        self.counters["last_run_at"] = time.time()
+        self.write_status()
+        logging.info(f"Refreshed outputs for {', '.join(datasets)} in {self.counters['last_run_seconds']}s")
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def main(interval=5.0, debounce=10.0, max_delay=60.0, concurrency=4, workers=None, rerun=True, once=False):
+    watcher = Watcher(interval=interval, debounce=debounce, max_delay=max_delay,
+                      concurrency=concurrency, workers=workers, rerun=rerun)
+    return asyncio.run(watcher.run(once=once))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+import config
+from derive_city_hour import derive
+from schema import get_schema
+
+
+def _station_hour(hours=6):
+    schema = get_schema("station_hour")
+    rng = np.random.default_rng(0)
+    stamps = pd.date_range("2015-01-01", periods=hours, freq="h")
+    rows = [(city, t, f"{city}_{i}") for t in stamps for city in ("Chennai", "Delhi") for i in (1, 2)]
+    df = pd.DataFrame(rows, columns=["City", config.DATE_COLUMN, "Station"])
+    for m in schema.measures:
+        df[m] = rng.uniform(0, 500, len(df)).round(1)
+    df["AQI_Bucket"] = "Good"
+    return df[list(schema.columns)]
+
+
+def _expected(df):
+    measures = list(get_schema("city_hour").measures)
+    return df.groupby([config.DATE_COLUMN, "City"])[measures].mean().reset_index()
+
+
+def test_late_row_is_merged_into_its_hour(tmp_path):
+    df = _station_hour()
+    # Move one reading of the first hour to the end of the file
+    late = df[(df["City"] == "Chennai") & (df[config.DATE_COLUMN] == df[config.DATE_COLUMN].min())].index[:1]
+    df = pd.concat([df.drop(late), df.loc[late]], ignore_index=True)
+    source, target = tmp_path / "station_hour.csv", tmp_path / "city_hour.csv"
+    df.to_csv(source, index=False, date_format=config.DATE_FORMAT_HOURLY)
+
+    rows_in, rows_out, _ = derive(str(source), str(target), chunksize=5)
+
+    out = pd.read_csv(target, parse_dates=[config.DATE_COLUMN])
+    expected = _expected(df)
+    assert rows_in == len(df)
+    assert rows_out == len(out) == len(expected)
+    assert not out.duplicated(["City", config.DATE_COLUMN]).any()
+    measures = list(get_schema("city_hour").measures)
+    np.testing.assert_allclose(out[measures].to_numpy(), expected[measures].to_numpy(), rtol=1e-9)
+
+
+def test_ordered_input_streams_in_one_pass(tmp_path):
+    df = _station_hour()
+    source, target = tmp_path / "station_hour.csv", tmp_path / "city_hour.csv"
+    df.to_csv(source, index=False, date_format=config.DATE_FORMAT_HOURLY)
+
+    derive(str(source), str(target), chunksize=3)
+
+    out = pd.read_csv(target, parse_dates=[config.DATE_COLUMN])
+    expected = _expected(df)
+    assert (out[["City", config.DATE_COLUMN]].to_numpy() == expected[["City", config.DATE_COLUMN]].to_numpy()).all()
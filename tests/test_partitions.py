@@ -0,0 +1,49 @@
+import dataclasses
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+import schema
+from partitions import write_partitions
+from schema import load_dataset
+
+
+@pytest.fixture
+def city_hour(tmp_path, monkeypatch):
+    """A small processed city_hour file whose first hours start at 06:00, partitioned under tmp_path."""
+    stamps = pd.date_range("2019-12-31 06:00", "2020-01-02 18:00", freq="3h")
+    df = pd.DataFrame([(city, t) for city in ("Delhi", "Mumbai") for t in stamps],
+                      columns=["City", config.DATE_COLUMN])
+    # Mumbai only starts reporting on 2020-01-01 06:00
+    df = df[(df["City"] == "Delhi") | (df[config.DATE_COLUMN] >= "2020-01-01 06:00")]
+    rng = np.random.default_rng(0)
+    for m in schema.get_schema("city_hour").measures:
+        df[m] = rng.uniform(0, 500, len(df)).round(1)
+    df["AQI_Bucket"] = "Poor"
+    path = tmp_path / "city_hour_cleaned.csv"
+    df[list(schema.get_schema("city_hour").columns)].to_csv(path, index=False,
+                                                            date_format=config.DATE_FORMAT_HOURLY)
+
+    monkeypatch.setitem(schema.SCHEMAS, "city_hour", dataclasses.replace(schema.SCHEMAS["city_hour"], path=str(path)))
+    monkeypatch.setattr(config, "PARTITIONED_DATA_DIR", str(tmp_path / "partitioned"))
+    return path
+
+
+@pytest.mark.parametrize("filters", [
+    dict(cities=["Mumbai"], end="2020-01-01"),
+    dict(cities=["Mumbai"], start="2020-01-01", end="2020-01-01"),
+    dict(start="2020-01-01 07:00", end="2020-01-02"),
+    dict(end="2019-12-31"),
+    dict(cities=["Delhi", "Mumbai"], start="2020-01-02 12:00"),
+])
+def test_partitioned_load_matches_flat_load(city_hour, filters):
+    flat = load_dataset("city_hour", sample=0, **filters)
+    write_partitions("city_hour")
+    partitioned = load_dataset("city_hour", sample=0, **filters)
+
+    assert len(flat)
+    sort = ["City", config.DATE_COLUMN]
+    pd.testing.assert_frame_equal(partitioned.sort_values(sort).reset_index(drop=True),
+                                  flat.sort_values(sort).reset_index(drop=True))